@@ -3,33 +3,106 @@ This class is responsible for storing all the information about the current stat
 It will also be responsible for determining valid moves at the current state. It will also keep a move log.
 """
 
+import cProfile
+import functools
+import pstats
+import sys
+import time
+from array import array
+
+from Chess.attacks import BLACK_PAWN_ATTACKERS, DIRECTIONS, KING_TARGETS, KNIGHT_TARGETS, RAYS, WHITE_PAWN_ATTACKERS
+from Chess.evaluation import ENDGAME_SCORES, MIDGAME_SCORES, PHASE_WEIGHTS, PIECE_VALUES, board_scores
+from Chess.zobrist import PIECE_KEYS, SIDE_KEY, compute_key
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
 
 class GameState:
-    def __init__(self):
+    def __init__(self, board=None, white_to_move=True, halfmove_clock=0, fullmove_number=1):
         # Board is an 8x8 2d list, each element of the list has 2 characters
         # Fist character represents the color of the piece, 'b' or 'w'
         # The second character represents the type of the piece, 'K', 'Q', 'R', 'B', 'N' or 'p'
         # "--" - represents an empty space with no piece.
-        self.board = [
-            ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
-            ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
-            ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"],
-        ]
-        self.move_functions = {"p": self.get_pawn_moves, "R": self.get_rook_moves, "N": self.get_knight_moves,
-                               "B": self.get_bishop_moves, "Q": self.get_queen_moves, "K": self.get_king_moves}
-
-        self.white_to_move = True
+        if board is None:
+            board = [
+                ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
+                ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
+                ["--", "--", "--", "--", "--", "--", "--", "--"],
+                ["--", "--", "--", "--", "--", "--", "--", "--"],
+                ["--", "--", "--", "--", "--", "--", "--", "--"],
+                ["--", "--", "--", "--", "--", "--", "--", "--"],
+                ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
+                ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"],
+            ]
+        self.board = [list(row) for row in board]  # Copy so the caller's board is never mutated
+
+        self.white_to_move = white_to_move
         self.move_log = []
         self.white_king_location = (7, 4)
         self.black_king_location = (0, 4)
+        # Squares of every piece per color, kept up to date like the king locations so move generation
+        # only visits occupied squares
+        self.piece_locations = {"w": set(), "b": set()}
+        for row in range(8):
+            for col in range(8):
+                if self.board[row][col] != "--":
+                    self.piece_locations[self.board[row][col][0]].add((row, col))
+                if self.board[row][col] == "wK":
+                    self.white_king_location = (row, col)
+                elif self.board[row][col] == "bK":
+                    self.black_king_location = (row, col)
         self.in_check = False
         self.pins = []
         self.checks = []
+        self.zobrist_key = compute_key(self.board, self.white_to_move)
+        self.key_log = []  # Keys of the positions before each move in move_log
+        # Material and piece-square totals (white's minus black's) for the midgame and endgame, and the game phase.
+        # make_move and undo_move update them by the moved and captured pieces, so evaluation never scans the board
+        self.midgame_score, self.endgame_score, self.phase = board_scores(self.board)
+        self.move_cache = None  # Optional Chess.movecache.MoveCache for get_valid_moves
+        # Move counters of the starting position, to_fen counts on from these
+        self.start_halfmove_clock = halfmove_clock
+        self.start_fullmove_number = fullmove_number
+
+    """
+    Create a GameState from a FEN string. Castling and en-passant fields are accepted but ignored
+    since the engine doesn't play those moves yet
+    """
+    @classmethod
+    def from_fen(cls, fen):
+        return cls(*parse_fen(fen))
+
+    """
+    The current position as a FEN string
+    """
+    def to_fen(self):
+        placement = []
+        for row in self.board:
+            rank = ""
+            empty = 0
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += piece[1].upper() if piece[0] == "w" else piece[1].lower()
+            placement.append(rank + (str(empty) if empty else ""))
+
+        # Plies since the last capture or pawn move, counting on from the starting position's clock
+        halfmove_clock = 0
+        for move in reversed(self.move_log):
+            if move.piece_captured != "--" or move.piece_moved[1] == "p":
+                break
+            halfmove_clock += 1
+        else:
+            halfmove_clock += self.start_halfmove_clock
+        started_white = self.white_to_move == (len(self.move_log) % 2 == 0)
+        fullmove_number = self.start_fullmove_number + (len(self.move_log) + (0 if started_white else 1)) // 2
+
+        side = "w" if self.white_to_move else "b"
+        return f"{'/'.join(placement)} {side} - - {halfmove_clock} {fullmove_number}"
 
     """
     Takes a Move as a parameter and executes it (not working for castling and en-passant)
@@ -40,6 +113,29 @@ class GameState:
         self.move_log.append(move)  # Log the move so we can undo it later
         self.white_to_move = not self.white_to_move
 
+        # Update the piece locations, a captured piece is removed from its side
+        locations = self.piece_locations[move.piece_moved[0]]
+        locations.remove((move.start_row, move.start_column))
+        locations.add((move.end_row, move.end_column))
+        if move.piece_captured != "--":
+            self.piece_locations[move.piece_captured[0]].remove((move.end_row, move.end_column))
+
+        # Update the hash key with the piece leaving its square, anything captured and the side to move
+        start_sq = move.start_row * 8 + move.start_column
+        end_sq = move.end_row * 8 + move.end_column
+        self.key_log.append(self.zobrist_key)
+        self.zobrist_key ^= PIECE_KEYS[move.piece_moved][start_sq] ^ PIECE_KEYS[move.piece_moved][end_sq] ^ SIDE_KEY
+        if move.piece_captured != "--":
+            self.zobrist_key ^= PIECE_KEYS[move.piece_captured][end_sq]
+
+        # Update the evaluation totals the same way
+        self.midgame_score += MIDGAME_SCORES[move.piece_moved][end_sq] - MIDGAME_SCORES[move.piece_moved][start_sq]
+        self.endgame_score += ENDGAME_SCORES[move.piece_moved][end_sq] - ENDGAME_SCORES[move.piece_moved][start_sq]
+        if move.piece_captured != "--":
+            self.midgame_score -= MIDGAME_SCORES[move.piece_captured][end_sq]
+            self.endgame_score -= ENDGAME_SCORES[move.piece_captured][end_sq]
+            self.phase -= PHASE_WEIGHTS[move.piece_captured[1]]
+
         # Update the kings location if it is moved
         if move.piece_moved == "wK":
             self.white_king_location = (move.end_row, move.end_column)
@@ -55,6 +151,23 @@ class GameState:
             self.board[move.start_row][move.start_column] = move.piece_moved
             self.board[move.end_row][move.end_column] = move.piece_captured
             self.white_to_move = not self.white_to_move
+            self.zobrist_key = self.key_log.pop()
+
+            # Reverse the evaluation updates of make_move
+            start_sq = move.start_row * 8 + move.start_column
+            end_sq = move.end_row * 8 + move.end_column
+            self.midgame_score -= MIDGAME_SCORES[move.piece_moved][end_sq] - MIDGAME_SCORES[move.piece_moved][start_sq]
+            self.endgame_score -= ENDGAME_SCORES[move.piece_moved][end_sq] - ENDGAME_SCORES[move.piece_moved][start_sq]
+            if move.piece_captured != "--":
+                self.midgame_score += MIDGAME_SCORES[move.piece_captured][end_sq]
+                self.endgame_score += ENDGAME_SCORES[move.piece_captured][end_sq]
+                self.phase += PHASE_WEIGHTS[move.piece_captured[1]]
+
+            locations = self.piece_locations[move.piece_moved[0]]
+            locations.remove((move.end_row, move.end_column))
+            locations.add((move.start_row, move.start_column))
+            if move.piece_captured != "--":
+                self.piece_locations[move.piece_captured[0]].add((move.end_row, move.end_column))
 
             # Update the kings position if its undone
             if move.piece_moved == "wK":
@@ -63,9 +176,26 @@ class GameState:
                 self.black_king_location = (move.start_row, move.start_column)
 
     """
-    All moves considering checks
+    Returns how many times the current position occurred before with the same side to move
     """
-    def get_valid_moves(self):
+    def repetition_count(self):
+        # Only every second earlier position has the same side to move
+        return self.key_log[-2::-2].count(self.zobrist_key)
+
+    """
+    All moves considering checks, captures and quiets select which kind of moves are generated.
+    With a move cache, a position seen before gets a copy of its stored moves and check/pin state
+    """
+    def get_valid_moves(self, captures=True, quiets=True):
+        if self.move_cache is not None:
+            cache_key = (self.zobrist_key, captures, quiets)
+            entry = self.move_cache.get(cache_key)
+            if entry is not None:
+                moves, self.in_check, pins, checks = entry
+                self.pins = list(pins)
+                self.checks = list(checks)
+                return list(moves)
+
         moves = []
         self.in_check, self.pins, self.checks = self.check_for_pins_and_checks()
         if self.white_to_move:
@@ -76,62 +206,156 @@ class GameState:
             king_col = self.black_king_location[1]
         if self.in_check:
             if len(self.checks) == 1:
-                moves = self.get_all_possible_moves()
-                check = self.checks[0]
-                check_row = check[0]
-                check_col = check[1]
-                piece_thats_checking = self.board[check_row][check_col]
-                valid_squares = []
-
-                if piece_thats_checking[1] == "N":
-                    valid_squares = [(check_row, check_col)]
-                else:
-                    for i in range(1, 8):
-                        valid_square = (king_row + check[2] * i, king_col + check[3] * i)
-                        valid_squares.append(valid_square)
-                        if valid_square[0] == check_row and valid_square[1] == check_col:
-                            break
+                moves = self.get_all_possible_moves(captures, quiets)
+                valid_squares = self.get_check_block_squares(king_row, king_col)
 
-                for i in range(len(moves) - 1, -1, -1):
-                    if moves[i].piece_moved[1] != "K":
-                        if not (moves[i].end_row, moves[i].end_column) in valid_squares:
-                            moves.remove(moves[i])
+                # Filter in one pass, the king's own moves were already checked for safety
+                moves = [move for move in moves
+                         if move.piece_moved[1] == "K" or move.move_id & 63 in valid_squares]
             else:
-                self.get_king_moves(king_row, king_col, moves)
+                self.get_king_moves(king_row, king_col, moves, captures, quiets)
         else:
-            moves = self.get_all_possible_moves()
+            moves = self.get_all_possible_moves(captures, quiets)
 
+        if self.move_cache is not None:
+            self.move_cache.put(cache_key, (tuple(moves), self.in_check, tuple(self.pins), tuple(self.checks)))
         return moves
 
+    """
+    Squares (as row * 8 + col) where a piece other than the king stops the single check: capturing the
+    checking piece or stepping between it and the king
+    """
+    def get_check_block_squares(self, king_row, king_col):
+        check_row, check_col, d_row, d_col = self.checks[0]
+        if self.board[check_row][check_col][1] == "N":
+            return {check_row * 8 + check_col}
+        valid_squares = set()
+        for i in range(1, 8):
+            valid_row = king_row + d_row * i
+            valid_col = king_col + d_col * i
+            valid_squares.add(valid_row * 8 + valid_col)
+            if valid_row == check_row and valid_col == check_col:
+                break
+        return valid_squares
+
+    """
+    Check a single move for legality by generating only the moves of the piece on its start square
+    """
+    def is_valid_move(self, move):
+        piece = self.board[move.start_row][move.start_column]
+        if piece[0] != ("w" if self.white_to_move else "b") or piece != move.piece_moved or \
+                self.board[move.end_row][move.end_column] != move.piece_captured:
+            return False
+        self.in_check, self.pins, self.checks = self.check_for_pins_and_checks()
+        if len(self.checks) > 1 and piece[1] != "K":
+            return False  # Only the king can get out of a double check
+        moves = []
+        self.move_functions[piece[1]](self, move.start_row, move.start_column, moves)
+        if move not in moves:
+            return False
+        if self.in_check and piece[1] != "K":
+            king_row, king_col = self.white_king_location if self.white_to_move else self.black_king_location
+            return move.move_id & 63 in self.get_check_block_squares(king_row, king_col)
+        return True
+
+    """
+    Yield the valid moves in stages for a search that usually stops early: the hash move, winning and even
+    captures by MVV-LVA, the killer moves, quiet moves by history score and finally the losing captures.
+    A stage is only generated once the earlier ones are used up, so a cutoff on the hash move or a capture
+    never generates the quiet moves. The position must be the same every time the next move is taken.
+    """
+    def get_valid_moves_staged(self, hash_move_id=0, killer_ids=(), history=None):
+        done = set()  # Ids already yielded by an earlier stage
+        if hash_move_id:
+            move = Move.from_id(hash_move_id, self.board)
+            if self.is_valid_move(move):
+                done.add(hash_move_id)
+                yield move
+
+        captures = self.get_valid_moves(quiets=False)
+        captures.sort(key=mvv_lva, reverse=True)
+        losing_captures = []
+        for move in captures:
+            if move.move_id in done:
+                continue
+            # Taking a smaller piece with a bigger one only wins when the target square is not defended
+            if PIECE_VALUES[move.piece_captured[1]] < PIECE_VALUES[move.piece_moved[1]] and \
+                    self.is_square_attacked(move.end_row, move.end_column, not self.white_to_move):
+                losing_captures.append(move)
+                continue
+            done.add(move.move_id)
+            yield move
+
+        for killer_id in killer_ids:
+            if killer_id and killer_id not in done:
+                move = Move.from_id(killer_id, self.board)
+                if move.piece_captured == "--" and self.is_valid_move(move):
+                    done.add(killer_id)
+                    yield move
+
+        quiets = self.get_valid_moves(captures=False)
+        if history is not None:
+            quiets.sort(key=lambda quiet: history[quiet.move_id], reverse=True)
+        for move in quiets:
+            if move.move_id not in done:
+                yield move
+
+        yield from losing_captures
+
+    """
+    All moves considering checks as an array of 16-bit move ids (see Move.move_id), for callers that only need the
+    squares: two bytes per move and membership tests without Move objects
+    """
+    def get_valid_move_ids(self):
+        return array("H", [move.move_id for move in self.get_valid_moves()])
+
     """
     Determine if the enemy can attack the square (row, col)
     """
     def square_under_attack(self, row, col):
-        self.white_to_move = not self.white_to_move
-        opponent_moves = self.get_all_possible_moves()
-        self.white_to_move = not self.white_to_move
-        for move in opponent_moves:
-            if move.end_row == row and move.end_column == col: # Square is under attack
+        return self.is_square_attacked(row, col, not self.white_to_move)
+
+    """
+    Determine if a piece of the given side attacks the square (row, col), looking outwards from the square
+    with the precomputed attack tables instead of generating the other side's moves
+    """
+    def is_square_attacked(self, row, col, by_white):
+        board = self.board
+        enemy_color = "w" if by_white else "b"
+        for end_row, end_col in KNIGHT_TARGETS[row][col]:
+            if board[end_row][end_col] == enemy_color + "N":
+                return True
+        for end_row, end_col in KING_TARGETS[row][col]:
+            if board[end_row][end_col] == enemy_color + "K":
+                return True
+        pawn_attackers = WHITE_PAWN_ATTACKERS if by_white else BLACK_PAWN_ATTACKERS
+        for end_row, end_col in pawn_attackers[row][col]:
+            if board[end_row][end_col] == enemy_color + "p":
                 return True
 
+        rays = RAYS[row][col]
+        for j in range(8):
+            slider = "R" if j < 4 else "B"  # First four directions are orthogonal, the last four diagonal
+            for end_row, end_col in rays[j]:
+                end_piece = board[end_row][end_col]
+                if end_piece != "--":
+                    if end_piece[0] == enemy_color and (end_piece[1] == slider or end_piece[1] == "Q"):
+                        return True
+                    break
         return False
     """
     All moves without considering checks
     """
-    def get_all_possible_moves(self):
+    def get_all_possible_moves(self, captures=True, quiets=True):
         moves = []
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                turn = self.board[row][col][0]
-                if (turn == 'w' and self.white_to_move) or (turn == 'b' and not self.white_to_move):
-                    piece = self.board[row][col][1]
-                    self.move_functions[piece](row, col, moves)
+        for row, col in self.piece_locations["w" if self.white_to_move else "b"]:
+            self.move_functions[self.board[row][col][1]](self, row, col, moves, captures, quiets)
 
         return moves
     """
     Get all the pawn moves for the pawn located at row, col and add these moves to the list
     """
-    def get_pawn_moves(self, row, col, moves):
+    def get_pawn_moves(self, row, col, moves, captures=True, quiets=True):
         piece_pinned = False
         pin_direction = ()
         for i in range(len(self.pins) - 1, -1, -1):
@@ -141,40 +365,43 @@ class GameState:
                 self.pins.remove(self.pins[i])
                 break
 
+        if (self.white_to_move and row == 0) or (not self.white_to_move and row == 7):
+            return  # No promotion yet, so a pawn on the last rank has no moves
+
         if self.white_to_move:  # White pawn moves
-            if self.board[row - 1][col] == "--":  # One square pawn advance
-                if not piece_pinned or pin_direction == (-1, 0):
-                    moves.append(Move((row, col), (row - 1, col), self.board))
+            if quiets and self.board[row - 1][col] == "--":  # One square pawn advance
+                if not piece_pinned or pin_direction in ((-1, 0), (1, 0)):  # Pinned along the file still moves
+                    moves.append(get_move(row, col, row - 1, col, self.board))
                     if row == 6 and self.board[row - 2][col] == "--": # Two square pawn advance
-                        moves.append(Move((row, col), (row - 2, col), self.board))
-            if col - 1 >= 0:  # Captures to the left
+                        moves.append(get_move(row, col, row - 2, col, self.board))
+            if captures and col - 1 >= 0:  # Captures to the left
                 if self.board[row - 1][col - 1][0] == 'b':  # Enemy piece to capture
                     if not piece_pinned or pin_direction == (-1, -1):
-                        moves.append(Move((row, col), (row - 1, col - 1), self.board))
-            if col + 1 <= 7:  # Captures to the right
+                        moves.append(get_move(row, col, row - 1, col - 1, self.board))
+            if captures and col + 1 <= 7:  # Captures to the right
                 if self.board[row - 1][col + 1][0] == 'b':  # Enemy piece to capture
                     if not piece_pinned or pin_direction == (-1, 1):
-                        moves.append(Move((row, col), (row - 1, col + 1), self.board))
+                        moves.append(get_move(row, col, row - 1, col + 1, self.board))
 
         else:  # Black pawn moves
-            if self.board[row + 1][col] == "--":  # One square pawn advance
-                if not piece_pinned or pin_direction == (1, 0):
-                    moves.append(Move((row, col), (row + 1, col), self.board))
+            if quiets and self.board[row + 1][col] == "--":  # One square pawn advance
+                if not piece_pinned or pin_direction in ((1, 0), (-1, 0)):  # Pinned along the file still moves
+                    moves.append(get_move(row, col, row + 1, col, self.board))
                     if row == 1 and self.board[row + 2][col] == "--":  # Two square pawn advance
-                        moves.append(Move((row, col), (row + 2, col), self.board))
-            if col - 1 >= 0:  # Captures to the left
+                        moves.append(get_move(row, col, row + 2, col, self.board))
+            if captures and col - 1 >= 0:  # Captures to the left
                 if self.board[row + 1][col - 1][0] == 'w':  # Enemy piece to capture
                     if not piece_pinned or pin_direction == (1, -1):
-                        moves.append(Move((row, col), (row + 1, col - 1), self.board))
-            if col + 1 <= 7:  # Captures to the right
+                        moves.append(get_move(row, col, row + 1, col - 1, self.board))
+            if captures and col + 1 <= 7:  # Captures to the right
                 if self.board[row + 1][col + 1][0] == 'w':  # Enemy piece to capture
                     if not piece_pinned or pin_direction == (1, 1):
-                        moves.append(Move((row, col), (row + 1, col + 1), self.board))
+                        moves.append(get_move(row, col, row + 1, col + 1, self.board))
 
     """ 
     Get all the rook moves for the rook located at row, col and add these moves to the list
     """
-    def get_rook_moves(self, row, col, moves):
+    def get_rook_moves(self, row, col, moves, captures=True, quiets=True):
         piece_pinned = False
         pin_direction = ()
         for i in range(len(self.pins) - 1, -1, -1):
@@ -195,9 +422,11 @@ class GameState:
                     if not piece_pinned or pin_direction == d or pin_direction == (-d[0], -d[1]):
                         end_piece = self.board[end_row][end_col]
                         if end_piece == "--":  # An empty space
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
+                            if quiets:
+                                moves.append(get_move(row, col, end_row, end_col, self.board))
                         elif end_piece[0] == enemy_color:  # An enemy piece
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
+                            if captures:
+                                moves.append(get_move(row, col, end_row, end_col, self.board))
                             break
                         else:  # Friendly piece which is invalid
                             break
@@ -208,14 +437,15 @@ class GameState:
     """ 
     Get all the bishop moves for the bishop located at row, col and add these moves to the list
     """
-    def get_bishop_moves(self, row, col, moves):
+    def get_bishop_moves(self, row, col, moves, captures=True, quiets=True):
         piece_pinned = False
         pin_direction = ()
         for i in range(len(self.pins) -1, -1, -1):
             if self.pins[i][0] == row and self.pins[i][1] == col:
                 piece_pinned = True
-                pin_direction = (self.pins[i][2], self.pins[3])
-                self.pins.remove([self.pins[i]])
+                pin_direction = (self.pins[i][2], self.pins[i][3])
+                if self.board[row][col][1] != "Q":  # The queen still needs the pin for its rook moves
+                    self.pins.remove(self.pins[i])
                 break
 
         directions = ((-1, -1), (-1, 1), (1, -1), (1, 1))  # Bishop diagonals
@@ -228,9 +458,11 @@ class GameState:
                     if not piece_pinned or pin_direction == d or pin_direction == (-d[0], -d[1]):
                         end_piece = self.board[end_row][end_col]
                         if end_piece == "--":  # An empty space
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
+                            if quiets:
+                                moves.append(get_move(row, col, end_row, end_col, self.board))
                         elif end_piece[0] == enemy_color:  # An enemy piece
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
+                            if captures:
+                                moves.append(get_move(row, col, end_row, end_col, self.board))
                             break
                         else:  # Friendly piece which is invalid
                             break
@@ -240,7 +472,7 @@ class GameState:
     """ 
     Get all the knight moves for the knight located at row, col and add these moves to the list
     """
-    def get_knight_moves(self, row, col, moves):
+    def get_knight_moves(self, row, col, moves, captures=True, quiets=True):
         piece_pinned = False
         for i in range(len(self.pins) - 1, -1, -1):
             if self.pins[i][0] == row and self.pins[i][1] == col:
@@ -258,43 +490,35 @@ class GameState:
                 if not piece_pinned:
                     end_piece = self.board[end_row][end_col]
                     if end_piece[0] != ally_color:  # We are not going to 'step on' an ally piece (empty or enemy piece)
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
+                        if quiets if end_piece == "--" else captures:
+                            moves.append(get_move(row, col, end_row, end_col, self.board))
 
     """ 
     Get all the queen moves for the queen located at row, col and add these moves to the list
     """
-    def get_queen_moves(self, row, col, moves):
+    def get_queen_moves(self, row, col, moves, captures=True, quiets=True):
         # Essentially the queen is a bishop and rook combined
-        self.get_bishop_moves(row, col, moves)
-        self.get_rook_moves(row, col, moves)
+        self.get_bishop_moves(row, col, moves, captures, quiets)
+        self.get_rook_moves(row, col, moves, captures, quiets)
 
     """ 
     Get all the king moves for the king located at row, col and add these moves to the list
     """
-    def get_king_moves(self, row, col, moves):
-        row_moves = (-1, -1, -1, 0, 0, 1, 1, 1)
-        col_moves = (-1, 0, 1, -1, 1, -1, 0, 1)
-        # The king moves in all directions
-        king_moves = ((1, 1), (-1, 1), (1, -1), (-1, -1), (1, 0), (-1, 0), (0, 1), (0, -1))
+    def get_king_moves(self, row, col, moves, captures=True, quiets=True):
         ally_color = "w" if self.white_to_move else "b"
-        for m in king_moves:  # ...and only once
-            end_row = row + m[0]
-            end_col = col + m[1]
-            if 0 <= end_row < 8 and 0 <= end_col < 8:  # Within bounds of the board
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally_color:  # We are not going to 'step on' an ally piece (empty or enemy piece)
-                    if ally_color == "w":
-                        self.white_king_location = (end_row, end_col)
-                    else:
-                        self.black_king_location = (end_row, end_col)
-                    in_check, pins, checks = self.check_for_pins_and_checks()
-
-                    if not in_check:
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
-                    if ally_color == "w":
-                        self.white_king_location = (row, col)
-                    else:
-                        self.black_king_location = (row, col)
+        king = self.board[row][col]
+        # Lift the king off the board so sliders attacking it also see the squares behind it
+        self.board[row][col] = "--"
+        safe_squares = []
+        for end_row, end_col in KING_TARGETS[row][col]:  # The king moves in all directions, ...and only once
+            end_piece = self.board[end_row][end_col]
+            if end_piece[0] != ally_color:  # We are not going to 'step on' an ally piece (empty or enemy piece)
+                if (quiets if end_piece == "--" else captures) and \
+                        not self.is_square_attacked(end_row, end_col, ally_color == "b"):
+                    safe_squares.append((end_row, end_col))
+        self.board[row][col] = king
+        for end_row, end_col in safe_squares:
+            moves.append(get_move(row, col, end_row, end_col, self.board))
 
     """
     Returns is the player is in check, a list of pins and a list of checks
@@ -316,57 +540,94 @@ class GameState:
             start_col = self.black_king_location[1]
 
         # Check outward from king for pins and checks, keep track of pins
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
-        for j in range(len(directions)):
-            direction = directions[j]
+        rays = RAYS[start_row][start_col]
+        for j in range(len(DIRECTIONS)):
+            direction = DIRECTIONS[j]
             possible_pin = ()
-            for i in range(1, 8):
-                end_row = start_row + direction[0] * i
-                end_col = start_col + direction[1] * i
-                if 0 <= end_row < 8 and 0 <= end_col < 8:
-                    end_piece = self.board[end_row][end_col]
-                    if end_piece[0] == ally_color and end_piece[1] != "K":
-                        if possible_pin == ():  # 1st allied piece could be pinned
-                            possible_pin = (end_row, end_col, direction[0], direction[1])
-                        else:  # 2nd piece is allied, so then its not a pin
+            for i, (end_row, end_col) in enumerate(rays[j], 1):
+                end_piece = self.board[end_row][end_col]
+                if end_piece[0] == ally_color and end_piece[1] != "K":
+                    if possible_pin == ():  # 1st allied piece could be pinned
+                        possible_pin = (end_row, end_col, direction[0], direction[1])
+                    else:  # 2nd piece is allied, so then its not a pin
+                        break
+                elif end_piece[0] == enemy_color:
+                    type = end_piece[1]
+                    # 5 possibilities in this monster of a conditional
+                    # 1.) Orthogonally away from king and piece is a rook
+                    # 2.) Diagonally away from a king and piece is a bishop
+                    # 3.) 1 square away diagonally from a king and piece is a pawn
+                    # 4.) any direction and piece is a queen
+                    # 5.) any direction 1 square away and piece is a king
+                    if (0 <= j <= 3 and type == "R") or \
+                        (4 <= j <= 7 and type == "B") or \
+                        (i == 1 and type == "p" and ((enemy_color == "w" and 6 <= j <= 7) or (enemy_color == "b" and 4 <= j <= 5))) or \
+                        (type == "Q") or \
+                        (i == 1 and type == "K"):
+                        if possible_pin == ():  # No piece blocking, so check
+                            in_check = True
+                            checks.append((end_row, end_col, direction[0], direction[1]))
                             break
-                    elif end_piece[0] == enemy_color:
-                        type = end_piece[1]
-                        # 5 possibilities in this monster of a conditional
-                        # 1.) Orthogonally away from king and piece is a rook
-                        # 2.) Diagonally away from a king and piece is a bishop
-                        # 3.) 1 square away diagonally from a king and piece is a pawn
-                        # 4.) any direction and piece is a queen
-                        # 5.) any direction 1 square away and piece is a king
-                        if (0 <= j <= 3 and type == "R") or \
-                            (4 <= j <= 7 and type == "B") or \
-                            (i == 1 and type == "p" and ((enemy_color == "w" and 6 <= j <= 7) or (enemy_color == "b" and 4 <= j <= 5))) or \
-                            (type == "Q") or \
-                            (i == 1 and type == "K"):
-                            if possible_pin == ():  # No piece blocking, so check
-                                in_check = True
-                                checks.append((end_row, end_col, direction[0], direction[1]))
-                                break
-                            else:  # Piece is blocking so pin
-                                pins.append(possible_pin)
-                                break
-                        else:  # Enemy piece is not applying check
+                        else:  # Piece is blocking so pin
+                            pins.append(possible_pin)
                             break
+                    else:  # Enemy piece is not applying check
+                        break
 
         # Check for knight checks
-        knight_moves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
-        for m in knight_moves:
-            end_row = start_row + m[0]
-            end_col = start_col + m[1]
-            if 0 <= end_row < 8 and 0 <= end_col <8:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] == enemy_color and end_piece == "N":
-                    in_check = True
-                    checks.append((end_row, end_col, m[0], m[1]))
+        for end_row, end_col in KNIGHT_TARGETS[start_row][start_col]:
+            end_piece = self.board[end_row][end_col]
+            if end_piece[0] == enemy_color and end_piece[1] == "N":
+                in_check = True
+                checks.append((end_row, end_col, end_row - start_row, end_col - start_col))
 
         return in_check, pins, checks
 
+    # Move generator per piece type, kept on the class (called with self) so profiling can swap them for all games
+    move_functions = {"p": get_pawn_moves, "R": get_rook_moves, "N": get_knight_moves, "B": get_bishop_moves,
+                      "Q": get_queen_moves, "K": get_king_moves}
+
+
+"""
+Split a FEN string into the GameState constructor arguments: (board, white_to_move, halfmove clock, fullmove number)
+"""
+def parse_fen(fen):
+    fields = fen.split()
+    if len(fields) < 2:
+        raise ValueError(f"FEN needs at least the piece placement and side to move: {fen!r}")
+    board = []
+    for rank in fields[0].split("/"):
+        row = []
+        for char in rank:
+            if char.isdigit():
+                row.extend(["--"] * int(char))
+            elif char.upper() in "PNBRQK":
+                row.append(("w" if char.isupper() else "b") + (char.upper() if char.upper() != "P" else "p"))
+            else:
+                raise ValueError(f"Invalid piece {char!r} in FEN: {fen!r}")
+        if len(row) != 8:
+            raise ValueError(f"Rank {rank!r} doesn't have 8 squares in FEN: {fen!r}")
+        board.append(row)
+    if len(board) != 8:
+        raise ValueError(f"FEN doesn't have 8 ranks: {fen!r}")
+    if fields[1] not in ("w", "b"):
+        raise ValueError(f"Invalid side to move {fields[1]!r} in FEN: {fen!r}")
+    halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+    fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+    return board, fields[1] == "w", halfmove_clock, fullmove_number
+
+
+"""
+Most valuable victim, least valuable attacker: prefer taking big pieces with small ones
+"""
+def mvv_lva(move):
+    return 10 * PIECE_VALUES[move.piece_captured[1]] - PIECE_VALUES[move.piece_moved[1]]
+
+
 class Move:
+    # Moves are created by the thousand during a search, so keep them small
+    __slots__ = ("start_row", "start_column", "end_row", "end_column", "piece_moved", "piece_captured", "move_id")
+
     # Maps keys to values
     # key : value
     ranks_to_rows = {"1": 7, "2": 6, "3": 5, "4": 4,
@@ -383,7 +644,15 @@ class Move:
         self.end_column = end_square[1]
         self.piece_moved = board[self.start_row][self.start_column]
         self.piece_captured = board[self.end_row][self.end_column]
-        self.move_id = self.start_row * 1000 + self.start_column * 100 + self.end_row * 10 + self.end_column
+        # Packed into 12 bits: start square (row * 8 + col) in the high 6 bits, end square in the low 6 bits
+        self.move_id = (self.start_row * 8 + self.start_column) << 6 | (self.end_row * 8 + self.end_column)
+
+    """
+    Rebuild a Move from its move_id, taking the pieces from the board
+    """
+    @staticmethod
+    def from_id(move_id, board):
+        return get_move(move_id >> 9, move_id >> 6 & 7, move_id >> 3 & 7, move_id & 7, board)
 
     """
     Overriding the equals method
@@ -393,10 +662,152 @@ class Move:
             return self.move_id == other.move_id
         return False
 
+    def __hash__(self):
+        return self.move_id
+
     def get_chess_notation(self):
         # TODO: make this more "real" chess notation like
         return self.get_rank_file(self.start_row, self.start_column) \
                + self.get_rank_file(self.end_row, self.end_column)
 
     def get_rank_file(self, row, col):
-        return self.cols_to_files[col] + self.rows_to_ranks[row]
\ No newline at end of file
+        return self.cols_to_files[col] + self.rows_to_ranks[row]
+
+
+# A Move never changes once made, so every combination of moved piece, captured piece and squares is created once
+# and handed out again, instead of allocating a new Move for every move generated
+_moves = {}  # (piece moved, piece captured, move_id) -> Move
+
+
+"""
+The Move from (row, col) to (end_row, end_col) with the pieces on the board, shared with every earlier request for
+the same pieces and squares
+"""
+def get_move(row, col, end_row, end_col, board):
+    piece_moved = board[row][col]
+    piece_captured = board[end_row][end_col]
+    key = (piece_moved, piece_captured, (row * 8 + col) << 6 | end_row * 8 + end_col)
+    move = _moves.get(key)
+    if move is None:
+        move = _moves[key] = Move((row, col), (end_row, end_col), board)
+    return move
+
+
+# Opt-in profiling of the hot paths. Enabling it swaps the methods below on the GameState class for timing
+# wrappers (for every instance, including ones created earlier), disabling it puts the originals back, so the
+# engine runs the unwrapped methods and pays nothing while profiling is off.
+PROFILED_METHODS = ("get_valid_moves", "get_all_possible_moves", "get_pawn_moves", "get_rook_moves",
+                    "get_bishop_moves", "get_knight_moves", "get_queen_moves", "get_king_moves",
+                    "check_for_pins_and_checks", "make_move", "undo_move")
+_profile_stats = {name: [0, 0.0] for name in PROFILED_METHODS}  # Name -> [calls, cumulative seconds]
+_original_methods = {}  # Name -> unwrapped function while profiling is enabled
+
+
+"""
+Start counting calls and cumulative time of the PROFILED_METHODS of every GameState
+"""
+def enable_profiling():
+    if _original_methods:
+        return
+    for name in PROFILED_METHODS:
+        _original_methods[name] = GameState.__dict__[name]
+        setattr(GameState, name, _timed(GameState.__dict__[name], _profile_stats[name]))
+    _update_move_functions()
+
+
+"""
+Stop counting and restore the original methods, the counters are kept until reset_profiling
+"""
+def disable_profiling():
+    for name, function in _original_methods.items():
+        setattr(GameState, name, function)
+    _original_methods.clear()
+    _update_move_functions()
+
+
+def profiling_enabled():
+    return bool(_original_methods)
+
+
+def reset_profiling():
+    for stats in _profile_stats.values():
+        stats[0] = 0
+        stats[1] = 0.0
+
+
+"""
+The counters as {method name: {"calls": n, "seconds": cumulative time}}. Times include the calls a method makes,
+so get_valid_moves includes the generators it runs
+"""
+def profiling_snapshot():
+    return {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in _profile_stats.items()}
+
+
+"""
+A snapshot as a table, slowest method first
+"""
+def format_profile(snapshot):
+    lines = [f"{'method':<28}{'calls':>12}{'seconds':>11}{'us/call':>10}"]
+    for name, stats in sorted(snapshot.items(), key=lambda item: -item[1]["seconds"]):
+        per_call = stats["seconds"] * 1e6 / stats["calls"] if stats["calls"] else 0.0
+        lines.append(f"{name:<28}{stats['calls']:>12}{stats['seconds']:>11.3f}{per_call:>10.2f}")
+    return "\n".join(lines)
+
+
+def _timed(function, stats):
+    perf_counter = time.perf_counter
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats[0] += 1
+            stats[1] += perf_counter() - start
+    return wrapper
+
+
+def _update_move_functions():
+    # The per-piece dispatch table holds the functions themselves, point it at the current class attributes
+    for piece, function in GameState.move_functions.items():
+        GameState.move_functions[piece] = GameState.__dict__[function.__name__]
+
+
+class EngineProfiler:
+    # Profiles the engine for the duration of a with block:
+    #     with EngineProfiler("search.prof") as profiler:
+    #         searcher.search(game_state, 5)
+    #     print(format_profile(profiler.snapshot))
+    # The counters are reset on entry. With a path, a cProfile of the whole block is also dumped there to be
+    # read with pstats (python -m pstats search.prof) or any other pstats viewer.
+    def __init__(self, cprofile_path=None):
+        self.cprofile_path = cprofile_path
+        self.profile = None
+        self.snapshot = None
+
+    def __enter__(self):
+        reset_profiling()
+        enable_profiling()
+        if self.cprofile_path is not None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.cprofile_path)
+        disable_profiling()
+        self.snapshot = profiling_snapshot()
+
+    """
+    Print the slowest functions of the cProfile run by cumulative time, or the counters table when the block ran
+    without a cProfile path
+    """
+    def print_stats(self, stream=sys.stdout, limit=20):
+        if self.profile is None:
+            snapshot = self.snapshot if self.snapshot is not None else profiling_snapshot()
+            print(format_profile(snapshot), file=stream)
+            return
+        pstats.Stats(self.profile, stream=stream).sort_stats("cumulative").print_stats(limit)
@@ -6,12 +6,16 @@ import pygame as p
 import pygame.display
 
 from Chess import ChessEngine
+from Chess.engine_worker import BEST_MOVE, PROGRESS, VALID_MOVES, EngineWorker
 
 WIDTH = HEIGHT = 512  # 400 is another option
 DIMENSION = 8  # A chessboard is 8x8
 SQ_SIZE = HEIGHT // DIMENSION
 MAX_FPS = 15
 IMAGES = {}
+WHITE_HUMAN = True  # False to let the engine play white
+BLACK_HUMAN = False  # False to let the engine play black
+AI_THINK_TIME = 2.0  # Seconds the engine may spend on a move
 
 '''
 Initialize a global dictionary of images. This will be called exactly once in the main
@@ -33,9 +37,15 @@ def main():
     clock = p.time.Clock()
     screen.fill(p.Color("white"))
     game_state = ChessEngine.GameState()
-    valid_moves = game_state.get_valid_moves()
-    move_made = False  # Flag variable for when a move is made
+    # The engine runs on a worker thread so the window keeps drawing while it works
+    worker = EngineWorker()
+    valid_moves = set()  # A set, so checking a clicked move is a hash lookup. Filled in by the worker
+    move_made = True  # Flag variable for when a move is made, starts True to ask for the first valid moves
     load_images()
+    board_surface = create_board_surface()  # The squares never change, so they are drawn only once
+    draw_game_state(screen, game_state, board_surface)
+    p.display.flip()
+    dirty_squares = set()  # Squares that changed since the last frame, only these get redrawn
 
     running = True
     square_selected = ()  # No square is selected, keep track of the last click of the user (tuple: (row, col))
@@ -45,8 +55,11 @@ def main():
         for e in p.event.get():
             if e.type == p.QUIT:
                 running = False
+            elif e.type == p.VIDEOEXPOSE:  # The window was covered or restored, repaint all of it
+                draw_game_state(screen, game_state, board_surface)
+                p.display.flip()
             # Mouse handler
-            elif e.type == p.MOUSEBUTTONDOWN:
+            elif e.type == p.MOUSEBUTTONDOWN and is_human_turn(game_state):
                 location = p.mouse.get_pos()  # (x, y) location of mouse
                 col = location[0] // SQ_SIZE
                 row = location[1] // SQ_SIZE
@@ -62,6 +75,7 @@ def main():
                     move = ChessEngine.Move(player_clicks[0], player_clicks[1], game_state.board)
                     if move in valid_moves:
                         game_state.make_move(move)
+                        dirty_squares.update(move_squares(move))
                         move_made = True
                         square_selected = ()
                         player_clicks = []
@@ -70,35 +84,94 @@ def main():
             # Key press handlers
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_z:  #When 'z' is pressed
+                    worker.cancel()  # Whatever the engine was working on is for a position that's gone
+                    if game_state.move_log:
+                        dirty_squares.update(move_squares(game_state.move_log[-1]))
                     game_state.undo_move()
+                    if not is_human_turn(game_state) and (WHITE_HUMAN or BLACK_HUMAN) and game_state.move_log:
+                        # Also take back the engine's move so it's the human's turn again
+                        dirty_squares.update(move_squares(game_state.move_log[-1]))
+                        game_state.undo_move()
+                    p.display.set_caption("mongoChess")
+                    square_selected = ()
+                    player_clicks = []
                     move_made = True
 
         if move_made:
-            valid_moves = game_state.get_valid_moves()
+            valid_moves = set()
+            worker.request_valid_moves(game_state)
+            if not is_human_turn(game_state):
+                worker.request_search(game_state, AI_THINK_TIME)
             move_made = False
 
-        draw_game_state(screen, game_state)
+        for kind, payload in worker.poll():
+            if kind == VALID_MOVES:
+                valid_moves = payload
+            elif kind == PROGRESS:
+                p.display.set_caption(f"mongoChess - thinking: depth {payload.depth}, {payload.nps} nps")
+            elif kind == BEST_MOVE:
+                p.display.set_caption("mongoChess")
+                if payload.best_move is not None:
+                    game_state.make_move(payload.best_move)
+                    dirty_squares.update(move_squares(payload.best_move))
+                    move_made = True
+
+        if dirty_squares:
+            p.display.update(draw_squares(screen, game_state.board, board_surface, dirty_squares))
+            dirty_squares.clear()
         clock.tick(MAX_FPS)
-        p.display.flip()
+
+    worker.shutdown()
+
+
+'''
+Whether the side to move is played by a human rather than the engine
+'''
+def is_human_turn(game_state):
+    return WHITE_HUMAN if game_state.white_to_move else BLACK_HUMAN
+
+
+'''
+The squares a move touches, these need to be redrawn after it's made or undone
+'''
+def move_squares(move):
+    return (move.start_row, move.start_column), (move.end_row, move.end_column)
 
 
 '''
 Responsible for all the graphics within a current game state
 '''
-def draw_game_state(screen, game_state):
-    draw_board(screen)
+def draw_game_state(screen, game_state, board_surface):
+    screen.blit(board_surface, (0, 0))
     draw_pieces(screen, game_state.board)
 
 
 '''
-Draw squares on the board
+Redraw only the given squares from the board surface and the pieces on them, returns the rects to update
+'''
+def draw_squares(screen, board, board_surface, squares):
+    rects = []
+    for row, col in squares:
+        rect = p.Rect(col * SQ_SIZE, row * SQ_SIZE, SQ_SIZE, SQ_SIZE)
+        screen.blit(board_surface, rect, rect)
+        piece = board[row][col]
+        if piece != "--":
+            screen.blit(IMAGES[piece], rect)
+        rects.append(rect)
+    return rects
+
+
+'''
+Draw squares of the board onto a surface once, it's blitted from there on every redraw
 '''
-def draw_board(screen):
+def create_board_surface():
+    surface = p.Surface((WIDTH, HEIGHT))
     colors = [p.Color("white"), p.Color("gray")]
     for row in range(DIMENSION):
         for col in range(DIMENSION):
             color = colors[((row + col) % 2)]
-            p.draw.rect(screen, color, p.Rect(col * SQ_SIZE, row * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+            p.draw.rect(surface, color, p.Rect(col * SQ_SIZE, row * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+    return surface.convert()
 
 
 '''
@@ -0,0 +1,64 @@
+"""
+Attack tables for every square, built once at import. Each table comes in two forms: lists of (row, col) squares
+for the 8x8 board of ChessEngine.GameState, and 64-bit masks (bit row * 8 + col) for the bitboard backend.
+"""
+
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+# Same order as used by GameState.check_for_pins_and_checks, orthogonal first then diagonal
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+# Ray directions for the bitboards, the first two walk towards higher square indices and the last two towards lower
+ROOK_DIRECTIONS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, -1), (-1, 1))
+
+
+def _step_squares(row, col, offsets):
+    return [(row + d_row, col + d_col) for d_row, d_col in offsets
+            if 0 <= row + d_row < 8 and 0 <= col + d_col < 8]
+
+
+def _ray_squares(row, col, direction):
+    ray = []
+    row, col = row + direction[0], col + direction[1]
+    while 0 <= row < 8 and 0 <= col < 8:
+        ray.append((row, col))
+        row, col = row + direction[0], col + direction[1]
+    return ray
+
+
+def _mask(squares):
+    mask = 0
+    for row, col in squares:
+        mask |= 1 << (row * 8 + col)
+    return mask
+
+
+# Square lists, indexed [row][col]
+KNIGHT_TARGETS = [[_step_squares(row, col, KNIGHT_OFFSETS) for col in range(8)] for row in range(8)]
+KING_TARGETS = [[_step_squares(row, col, KING_OFFSETS) for col in range(8)] for row in range(8)]
+# RAYS[row][col][j] walks outwards from (row, col) in DIRECTIONS[j]
+RAYS = [[[_ray_squares(row, col, d) for d in DIRECTIONS] for col in range(8)] for row in range(8)]
+# Squares a white / black pawn has to stand on to attack (row, col)
+WHITE_PAWN_ATTACKERS = [[_step_squares(row, col, ((1, -1), (1, 1))) for col in range(8)] for row in range(8)]
+BLACK_PAWN_ATTACKERS = [[_step_squares(row, col, ((-1, -1), (-1, 1))) for col in range(8)] for row in range(8)]
+
+# Bitboard masks, indexed by square
+KNIGHT_ATTACKS = [_mask(KNIGHT_TARGETS[sq // 8][sq % 8]) for sq in range(64)]
+KING_ATTACKS = [_mask(KING_TARGETS[sq // 8][sq % 8]) for sq in range(64)]
+# PAWN_ATTACKS[color][sq] are the squares a pawn of that color (0 white, 1 black) standing on sq attacks
+PAWN_ATTACKS = [[_mask(BLACK_PAWN_ATTACKERS[sq // 8][sq % 8]) for sq in range(64)],
+                [_mask(WHITE_PAWN_ATTACKERS[sq // 8][sq % 8]) for sq in range(64)]]
+ROOK_RAYS = [[_mask(_ray_squares(sq // 8, sq % 8, d)) for sq in range(64)] for d in ROOK_DIRECTIONS]
+BISHOP_RAYS = [[_mask(_ray_squares(sq // 8, sq % 8, d)) for sq in range(64)] for d in BISHOP_DIRECTIONS]
+
+
+def _between_mask(a, b):
+    for rays in (ROOK_RAYS, BISHOP_RAYS):
+        for ray in rays:
+            if ray[a] >> b & 1:
+                return ray[a] & ~ray[b] & ~(1 << b)
+    return 0
+
+
+# BETWEEN[a][b] are the squares strictly between a and b when they share a line, otherwise 0
+BETWEEN = [[_between_mask(a, b) for b in range(64)] for a in range(64)]
@@ -0,0 +1,229 @@
+"""
+Win/draw bitbases for the king and one piece against a bare king endings KPK, KRK and KQK.
+The generator retro-analyses every position of an ending with GameState's own move generation, so the results
+follow this engine's rules: there is no promotion, which makes KPK a win only where the pawn helps mate directly.
+The file holds one bit per position and side to move (set when the side with the piece wins), and it is
+memory-mapped by Bitbase, so probing is an index calculation and one byte lookup.
+Generate the file with ``python -m Chess.bitbase`` from the repository root, it takes a few minutes.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from Chess.attacks import KING_TARGETS
+from Chess.ChessEngine import GameState
+
+MAGIC = b"MCBB"
+ENDGAMES = ("p", "R", "Q")  # The piece next to the strong side's king
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "endgames.bin")
+# One position per side to move, strong king, weak king and piece square: side << 18 | king << 12 | king << 6 | piece
+TABLE_SIZE = 2 << 18
+TABLE_BYTES = TABLE_SIZE // 8
+# Header entries after the magic: piece letter and offset of its table
+HEADER_ENTRY = struct.Struct(">cI")
+
+# Probe results from the side to move's point of view
+LOSS = -1
+DRAW = 0
+WIN = 1
+
+
+'''
+Index of a position with the strong side playing white, strong_to_move says whose turn it is
+'''
+def position_index(strong_to_move, strong_king, weak_king, piece_square):
+    return (0 if strong_to_move else 1) << 18 | strong_king << 12 | weak_king << 6 | piece_square
+
+
+'''
+Retro-analyse one ending with white as the strong side, returns the packed win bits.
+Every legal position is expanded once with GameState to get its successors, then wins are propagated backwards
+from the mates: a position with white to move is won if any move reaches a lost position for black, and one with
+black to move is lost once every black move leads to a win for white. Black capturing the piece is a draw.
+'''
+def generate(piece, log=None):
+    remaining = array("B", bytes(TABLE_SIZE))  # Black moves not yet known to lose, for black to move positions
+    parents = array("i")
+    children = array("i")
+    mated = []
+    for index in range(TABLE_SIZE):
+        white_to_move = index >> 18 == 0
+        white_king, black_king, piece_square = index >> 12 & 63, index >> 6 & 63, index & 63
+        if white_king == black_king or piece_square in (white_king, black_king) or \
+                (black_king // 8, black_king % 8) in KING_TARGETS[white_king // 8][white_king % 8]:
+            continue
+        if piece == "p" and piece_square // 8 == 7:
+            continue  # A white pawn can never stand on the first rank
+
+        board = [["--"] * 8 for _ in range(8)]
+        board[white_king // 8][white_king % 8] = "wK"
+        board[black_king // 8][black_king % 8] = "bK"
+        board[piece_square // 8][piece_square % 8] = "w" + piece
+        game_state = GameState(board, white_to_move)
+        waiting_king = black_king if white_to_move else white_king
+        if game_state.is_square_attacked(waiting_king // 8, waiting_king % 8, white_to_move):
+            continue  # The side that just moved left its king in check
+
+        moves = game_state.get_valid_moves()
+        if not white_to_move:
+            remaining[index] = len(moves)
+            if not moves and game_state.in_check:
+                mated.append(index)
+        for move in moves:
+            if move.piece_captured != "--":
+                continue  # Only kings left, a draw
+            end_square = move.end_row * 8 + move.end_column
+            if move.piece_moved == "wK":
+                child = position_index(False, end_square, black_king, piece_square)
+            elif move.piece_moved == "bK":
+                child = position_index(True, white_king, end_square, piece_square)
+            else:
+                child = position_index(False, white_king, black_king, end_square)
+            parents.append(index)
+            children.append(child)
+        if log is not None and index & 0xFFFF == 0xFFFF:
+            print(f"K{piece.upper()}K: expanded {index + 1}/{TABLE_SIZE} positions", file=log)
+
+    # Group the parents of every position together (counting sort on the child)
+    starts = array("i", bytes(4 * (TABLE_SIZE + 1)))
+    for child in children:
+        starts[child + 1] += 1
+    for index in range(TABLE_SIZE):
+        starts[index + 1] += starts[index]
+    grouped = array("i", bytes(4 * len(parents)))
+    fill = array("i", starts)
+    for parent, child in zip(parents, children):
+        grouped[fill[child]] = parent
+        fill[child] += 1
+    del parents, children, fill
+
+    won = bytearray(TABLE_SIZE)  # White wins, whoever is to move
+    queue = mated
+    for index in mated:
+        won[index] = 1
+    while queue:
+        child = queue.pop()
+        for parent in grouped[starts[child]:starts[child + 1]]:
+            if won[parent]:
+                continue
+            if parent >> 18 == 1:  # Black to move, lost only when no move escapes
+                remaining[parent] -= 1
+                if remaining[parent]:
+                    continue
+            won[parent] = 1
+            queue.append(parent)
+
+    packed = bytearray(TABLE_BYTES)
+    for index in range(TABLE_SIZE):
+        if won[index]:
+            packed[index >> 3] |= 1 << (index & 7)
+    return bytes(packed)
+
+
+'''
+Generate the bitbases for the given endings and write them to one file
+'''
+def write_bitbase(path, endgames=ENDGAMES, log=None):
+    offset = len(MAGIC) + 1 + HEADER_ENTRY.size * len(endgames)
+    header = MAGIC + bytes([len(endgames)])
+    tables = []
+    for i, piece in enumerate(endgames):
+        header += HEADER_ENTRY.pack(piece.encode("ascii"), offset + i * TABLE_BYTES)
+        start = time.perf_counter()
+        tables.append(generate(piece, log))
+        if log is not None:
+            print(f"K{piece.upper()}K: done in {time.perf_counter() - start:.0f}s", file=log)
+    with open(path, "wb") as file:
+        file.write(header)
+        for table in tables:
+            file.write(table)
+
+
+class Bitbase:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        with open(path, "rb") as file:
+            self.mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mapped[:len(MAGIC)] != MAGIC:
+            self.mapped.close()
+            raise ValueError(f"{path} is not a bitbase file")
+        self.offsets = {}  # Piece letter -> offset of its table
+        for i in range(self.mapped[len(MAGIC)]):
+            piece, offset = HEADER_ENTRY.unpack_from(self.mapped, len(MAGIC) + 1 + i * HEADER_ENTRY.size)
+            self.offsets[piece.decode("ascii")] = offset
+
+    """
+    WIN, DRAW or LOSS for the side to move, or None if the position isn't covered by the bitbase
+    """
+    def probe(self, game_state):
+        white_pieces = game_state.piece_locations["w"]
+        black_pieces = game_state.piece_locations["b"]
+        if len(white_pieces) + len(black_pieces) != 3:
+            return None
+        if len(white_pieces) == 2:
+            strong_king, weak_king = game_state.white_king_location, game_state.black_king_location
+            strong_pieces, strong_to_move = white_pieces, game_state.white_to_move
+        else:
+            strong_king, weak_king = game_state.black_king_location, game_state.white_king_location
+            strong_pieces, strong_to_move = black_pieces, not game_state.white_to_move
+        for row, col in strong_pieces:
+            if (row, col) != strong_king:
+                piece_row, piece_col = row, col
+        offset = self.offsets.get(game_state.board[piece_row][piece_col][1])
+        if offset is None:
+            return None
+
+        if strong_pieces is white_pieces:
+            index = position_index(strong_to_move, strong_king[0] * 8 + strong_king[1], weak_king[0] * 8 + weak_king[1],
+                                   piece_row * 8 + piece_col)
+        else:  # Mirror the board so the strong side plays up the board like white
+            index = position_index(strong_to_move, (7 - strong_king[0]) * 8 + strong_king[1],
+                                   (7 - weak_king[0]) * 8 + weak_king[1], (7 - piece_row) * 8 + piece_col)
+        if not self.mapped[offset + (index >> 3)] >> (index & 7) & 1:
+            return DRAW
+        return WIN if strong_to_move else LOSS
+
+    def close(self):
+        self.mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Pickling sends only the path, each process maps the file again
+    def __getstate__(self):
+        return self.path
+
+    def __setstate__(self, path):
+        self.__init__(path)
+
+
+'''
+Open a bitbase file, or return None if it hasn't been generated
+'''
+def open_bitbase(path=DEFAULT_PATH):
+    return Bitbase(path) if os.path.exists(path) else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the KPK, KRK and KQK win/draw bitbases")
+    parser.add_argument("--output", default=DEFAULT_PATH, help=f"file to write (default: {DEFAULT_PATH})")
+    parser.add_argument("--endgames", default="".join(ENDGAMES),
+                        help="pieces to generate endings for, any of p, R and Q (default: pRQ)")
+    args = parser.parse_args(argv)
+    endgames = [piece for piece in args.endgames if piece in ENDGAMES]
+    if not endgames:
+        parser.error("no known endgames selected, use p, R and/or Q")
+    write_bitbase(args.output, endgames, sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
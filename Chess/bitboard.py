@@ -0,0 +1,392 @@
+"""
+Bitboard backed alternative to ChessEngine.GameState. Every piece type of every color is kept as a 64-bit integer
+where bit (row * 8 + col) is set when that square holds the piece, so move generation is done with mask
+arithmetic instead of comparing the strings on the board square by square.
+It implements the same API as GameState (get_valid_moves with captures and quiets, the staged generator, the move
+cache, FEN export, the incremental hash and evaluation totals), so perft, the search and the GUI take either one.
+The 8x8 board list is still kept in sync so Move objects and the GUI work unchanged.
+"""
+
+from Chess.ChessEngine import GameState, Move, parse_fen
+from Chess.attacks import BETWEEN, BISHOP_RAYS, KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, ROOK_RAYS
+from Chess.evaluation import ENDGAME_SCORES, MIDGAME_SCORES, PHASE_WEIGHTS, board_scores
+from Chess.zobrist import PIECE_KEYS, PIECES, SIDE_KEY, compute_key
+
+PIECE_INDEX = {piece: index for index, piece in enumerate(PIECES)}
+EMPTY = len(PIECES)  # Index of an empty square in piece_at
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_H = 0x8080808080808080
+ROW_2 = 0xFF << 16  # Black pawns land here after a single push from their start row
+ROW_5 = 0xFF << 40  # White pawns land here after a single push from their start row
+
+# A Move never changes once made, so every combination of moved piece, captured piece and squares is created once
+# and handed out again, keyed by moved << 16 | captured << 12 | move_id with the pieces as PIECE_INDEX (or EMPTY)
+_moves = {}
+
+
+def _slider_attacks(sq, occupied, rays):
+    attacks = 0
+    for i in range(4):
+        ray = rays[i][sq]
+        blockers = ray & occupied
+        if blockers:
+            if i < 2:  # Increasing direction, the nearest blocker is the lowest bit
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:  # Decreasing direction, the nearest blocker is the highest bit
+                blocker = blockers.bit_length() - 1
+            ray ^= rays[i][blocker]  # Cut off everything behind the blocker
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, ROOK_RAYS)
+
+
+def bishop_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, BISHOP_RAYS)
+
+
+def squares(bitboard):
+    while bitboard:
+        lowest = bitboard & -bitboard
+        yield lowest.bit_length() - 1
+        bitboard ^= lowest
+
+
+class BitboardGameState:
+    def __init__(self, board=None, white_to_move=True, halfmove_clock=0, fullmove_number=1):
+        if board is None:
+            board = [
+                ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
+                ["bp", "bp", "bp", "bp", "bp", "bp", "bp", "bp"],
+                ["--", "--", "--", "--", "--", "--", "--", "--"],
+                ["--", "--", "--", "--", "--", "--", "--", "--"],
+                ["--", "--", "--", "--", "--", "--", "--", "--"],
+                ["--", "--", "--", "--", "--", "--", "--", "--"],
+                ["wp", "wp", "wp", "wp", "wp", "wp", "wp", "wp"],
+                ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"],
+            ]
+        self.board = [list(row) for row in board]
+        self.bitboards = [0] * 12  # One bitboard per piece, indexed like PIECES
+        self.occupancy = [0, 0]  # All white pieces, all black pieces
+        self.piece_at = [EMPTY] * 64  # PIECE_INDEX of the piece on every square
+        self.piece_locations = {"w": set(), "b": set()}  # Same as GameState.piece_locations
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != "--":
+                    sq = row * 8 + col
+                    self.bitboards[PIECE_INDEX[piece]] |= 1 << sq
+                    self.occupancy[WHITE if piece[0] == "w" else BLACK] |= 1 << sq
+                    self.piece_at[sq] = PIECE_INDEX[piece]
+                    self.piece_locations[piece[0]].add((row, col))
+
+        self.white_to_move = white_to_move
+        self.move_log = []
+        self.in_check = False
+        self.zobrist_key = compute_key(self.board, white_to_move)
+        self.key_log = []
+        self.midgame_score, self.endgame_score, self.phase = board_scores(self.board)
+        self.move_cache = None  # Optional Chess.movecache.MoveCache for get_valid_moves
+        self.start_halfmove_clock = halfmove_clock
+        self.start_fullmove_number = fullmove_number
+
+    @classmethod
+    def from_fen(cls, fen):
+        return cls(*parse_fen(fen))
+
+    @property
+    def white_king_location(self):
+        return divmod(self.bitboards[KING].bit_length() - 1, 8)
+
+    @property
+    def black_king_location(self):
+        return divmod(self.bitboards[6 + KING].bit_length() - 1, 8)
+
+    # These only go through the attributes and methods of this class, so they are shared with GameState as they are
+    to_fen = GameState.to_fen
+    repetition_count = GameState.repetition_count
+    get_valid_move_ids = GameState.get_valid_move_ids
+    get_valid_moves_staged = GameState.get_valid_moves_staged
+
+    """
+    Takes a Move as a parameter and executes it (not working for castling and en-passant)
+    """
+    def make_move(self, move):
+        start_sq = move.move_id >> 6
+        end_sq = move.move_id & 63
+        start = 1 << start_sq
+        end = 1 << end_sq
+        moved = self.piece_at[start_sq]
+        captured = self.piece_at[end_sq]
+        side = WHITE if moved < 6 else BLACK
+        self.bitboards[moved] ^= start | end
+        self.occupancy[side] ^= start | end
+        self.piece_at[start_sq] = EMPTY
+        self.piece_at[end_sq] = moved
+        locations = self.piece_locations[move.piece_moved[0]]
+        locations.remove((move.start_row, move.start_column))
+        locations.add((move.end_row, move.end_column))
+        if captured != EMPTY:
+            self.bitboards[captured] ^= end
+            self.occupancy[side ^ 1] ^= end
+            self.piece_locations[move.piece_captured[0]].remove((move.end_row, move.end_column))
+
+        self.board[move.start_row][move.start_column] = "--"
+        self.board[move.end_row][move.end_column] = move.piece_moved
+        self.move_log.append(move)
+        self.white_to_move = not self.white_to_move
+
+        self.key_log.append(self.zobrist_key)
+        self.zobrist_key ^= PIECE_KEYS[move.piece_moved][start_sq] ^ PIECE_KEYS[move.piece_moved][end_sq] ^ SIDE_KEY
+        self.midgame_score += MIDGAME_SCORES[move.piece_moved][end_sq] - MIDGAME_SCORES[move.piece_moved][start_sq]
+        self.endgame_score += ENDGAME_SCORES[move.piece_moved][end_sq] - ENDGAME_SCORES[move.piece_moved][start_sq]
+        if captured != EMPTY:
+            self.zobrist_key ^= PIECE_KEYS[move.piece_captured][end_sq]
+            self.midgame_score -= MIDGAME_SCORES[move.piece_captured][end_sq]
+            self.endgame_score -= ENDGAME_SCORES[move.piece_captured][end_sq]
+            self.phase -= PHASE_WEIGHTS[move.piece_captured[1]]
+
+    """
+    Undo the last move made
+    """
+    def undo_move(self):
+        if len(self.move_log) != 0:
+            move = self.move_log.pop()
+            start_sq = move.move_id >> 6
+            end_sq = move.move_id & 63
+            start = 1 << start_sq
+            end = 1 << end_sq
+            moved = self.piece_at[end_sq]
+            side = WHITE if moved < 6 else BLACK
+            self.bitboards[moved] ^= start | end
+            self.occupancy[side] ^= start | end
+            self.piece_at[start_sq] = moved
+            locations = self.piece_locations[move.piece_moved[0]]
+            locations.remove((move.end_row, move.end_column))
+            locations.add((move.start_row, move.start_column))
+            if move.piece_captured != "--":
+                captured = PIECE_INDEX[move.piece_captured]
+                self.bitboards[captured] ^= end
+                self.occupancy[side ^ 1] ^= end
+                self.piece_at[end_sq] = captured
+                self.piece_locations[move.piece_captured[0]].add((move.end_row, move.end_column))
+            else:
+                self.piece_at[end_sq] = EMPTY
+
+            self.board[move.start_row][move.start_column] = move.piece_moved
+            self.board[move.end_row][move.end_column] = move.piece_captured
+            self.white_to_move = not self.white_to_move
+
+            self.zobrist_key = self.key_log.pop()
+            self.midgame_score -= MIDGAME_SCORES[move.piece_moved][end_sq] - MIDGAME_SCORES[move.piece_moved][start_sq]
+            self.endgame_score -= ENDGAME_SCORES[move.piece_moved][end_sq] - ENDGAME_SCORES[move.piece_moved][start_sq]
+            if move.piece_captured != "--":
+                self.midgame_score += MIDGAME_SCORES[move.piece_captured][end_sq]
+                self.endgame_score += ENDGAME_SCORES[move.piece_captured][end_sq]
+                self.phase += PHASE_WEIGHTS[move.piece_captured[1]]
+
+    """
+    Returns a bitboard of the pieces of color by_side attacking sq, ignoring the pieces on the removed squares
+    """
+    def attackers_to(self, sq, by_side, occupied, removed=0):
+        bitboards = self.bitboards
+        base = by_side * 6
+        keep = ~removed
+        queens = bitboards[base + QUEEN]
+        return ((KNIGHT_ATTACKS[sq] & bitboards[base + KNIGHT])
+                | (KING_ATTACKS[sq] & bitboards[base + KING])
+                | (PAWN_ATTACKS[by_side ^ 1][sq] & bitboards[base + PAWN])
+                | (bishop_attacks(sq, occupied) & (bitboards[base + BISHOP] | queens))
+                | (rook_attacks(sq, occupied) & (bitboards[base + ROOK] | queens))) & keep
+
+    """
+    Determine if the enemy can attack the square (row, col)
+    """
+    def square_under_attack(self, row, col):
+        return self.is_square_attacked(row, col, not self.white_to_move)
+
+    """
+    Determine if a piece of the given side attacks the square (row, col)
+    """
+    def is_square_attacked(self, row, col, by_white):
+        occupied = self.occupancy[WHITE] | self.occupancy[BLACK]
+        return self.attackers_to(row * 8 + col, WHITE if by_white else BLACK, occupied) != 0
+
+    """
+    Check and pin state of the side to move as (king square, bitboard of the checking pieces, pins), where pins maps
+    the square of every pinned piece to the squares it can still move to: the line up to and including the pinner
+    """
+    def get_checks_and_pins(self):
+        side = WHITE if self.white_to_move else BLACK
+        base = (side ^ 1) * 6
+        bitboards = self.bitboards
+        own = self.occupancy[side]
+        enemy = self.occupancy[side ^ 1]
+        occupied = own | enemy
+        king_sq = bitboards[side * 6 + KING].bit_length() - 1
+        checkers = self.attackers_to(king_sq, side ^ 1, occupied)
+        self.in_check = checkers != 0
+
+        queens = bitboards[base + QUEEN]
+        # Enemy sliders that would see the king if only enemy pieces were on the board
+        snipers = ((bishop_attacks(king_sq, enemy) & (bitboards[base + BISHOP] | queens))
+                   | (rook_attacks(king_sq, enemy) & (bitboards[base + ROOK] | queens)))
+        pins = {}
+        for sq in squares(snipers):
+            line = BETWEEN[king_sq][sq]
+            blockers = line & occupied
+            if blockers and blockers & (blockers - 1) == 0 and blockers & own:  # Exactly one piece, ours
+                pins[blockers.bit_length() - 1] = line | 1 << sq
+        return king_sq, checkers, pins
+
+    """
+    Squares the piece (a PIECE_INDEX) on sq attacks or, for pawns, can move to, without considering checks
+    """
+    def get_piece_targets(self, sq, piece, own, enemy):
+        kind = piece % 6
+        if kind == KNIGHT:
+            return KNIGHT_ATTACKS[sq] & ~own
+        if kind == BISHOP:
+            return bishop_attacks(sq, own | enemy) & ~own
+        if kind == ROOK:
+            return rook_attacks(sq, own | enemy) & ~own
+        if kind == QUEEN:
+            return (bishop_attacks(sq, own | enemy) | rook_attacks(sq, own | enemy)) & ~own
+        if kind == KING:
+            return KING_ATTACKS[sq] & ~own
+        empty = ~(own | enemy) & FULL
+        if piece == PAWN:
+            single = 1 << sq >> 8 & empty
+            double = (single & ROW_5) >> 8 & empty
+        else:
+            single = 1 << sq << 8 & empty
+            double = (single & ROW_2) << 8 & empty
+        return single | double | (PAWN_ATTACKS[piece // 6][sq] & enemy)
+
+    """
+    All moves considering checks, captures and quiets select which kind of moves are generated.
+    With a move cache, a position seen before gets a copy of its stored moves
+    """
+    def get_valid_moves(self, captures=True, quiets=True):
+        if self.move_cache is not None:
+            cache_key = (self.zobrist_key, captures, quiets)
+            entry = self.move_cache.get(cache_key)
+            if entry is not None:
+                moves, self.in_check = entry
+                return list(moves)
+
+        king_sq, checkers, pins = self.get_checks_and_pins()
+        side = WHITE if self.white_to_move else BLACK
+        bitboards = self.bitboards
+        own = self.occupancy[side]
+        enemy = self.occupancy[side ^ 1]
+        occupied = own | enemy
+        targets = (enemy if captures else 0) | (~occupied & FULL if quiets else 0)
+        moves = []
+
+        if checkers & (checkers - 1) == 0:  # In double check only the king can move
+            piece_targets = targets
+            if checkers:  # Other pieces have to capture the checker or block the check
+                piece_targets &= BETWEEN[king_sq][checkers.bit_length() - 1] | checkers
+            base = side * 6
+            self.add_pawn_moves(side, bitboards[base + PAWN], own, enemy, piece_targets, pins, moves)
+            for piece in range(base + KNIGHT, base + KING):
+                for sq in squares(bitboards[piece]):
+                    allowed = self.get_piece_targets(sq, piece, own, enemy) & piece_targets
+                    if sq in pins:
+                        allowed &= pins[sq]
+                    self.add_moves(sq, allowed, moves)
+
+        # The king goes last, it is rarely the move to try first. It may not step onto an attacked square, which is
+        # looked at without the king so it can't hide behind itself
+        without_king = occupied ^ 1 << king_sq
+        king_targets = 0
+        for sq in squares(KING_ATTACKS[king_sq] & targets):
+            if not self.attackers_to(sq, side ^ 1, without_king, 1 << sq):
+                king_targets |= 1 << sq
+        self.add_moves(king_sq, king_targets, moves)
+
+        if self.move_cache is not None:
+            self.move_cache.put(cache_key, (tuple(moves), self.in_check))
+        return moves
+
+    """
+    Add the moves of all pawns at once by shifting the whole pawn bitboard, pinned pawns are added one by one
+    """
+    def add_pawn_moves(self, side, pawns, own, enemy, targets, pins, moves):
+        for sq in pins:
+            if pawns >> sq & 1:
+                pawns ^= 1 << sq
+                self.add_moves(sq, self.get_piece_targets(sq, side * 6 + PAWN, own, enemy) & targets & pins[sq], moves)
+        empty = ~(own | enemy) & FULL
+        if side == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & ROW_5) >> 8) & empty
+            shifted = ((single & targets, 8), (double & targets, 16),
+                       ((pawns >> 9) & ~FILE_H & enemy & targets, 9), ((pawns >> 7) & ~FILE_A & enemy & targets, 7))
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & ROW_2) << 8) & empty
+            shifted = ((single & targets, -8), (double & targets, -16),
+                       ((pawns << 7) & ~FILE_H & enemy & targets, -7), ((pawns << 9) & ~FILE_A & enemy & targets, -9))
+        piece_at = self.piece_at
+        for ends, offset in shifted:
+            while ends:
+                end = ends & -ends
+                ends ^= end
+                end_sq = end.bit_length() - 1
+                start_sq = end_sq + offset
+                key = piece_at[start_sq] << 16 | piece_at[end_sq] << 12 | start_sq << 6 | end_sq
+                move = _moves.get(key)
+                if move is None:
+                    move = _moves[key] = Move(divmod(start_sq, 8), divmod(end_sq, 8), self.board)
+                moves.append(move)
+
+    """
+    Add the moves of the piece on start_sq to every square of the targets bitboard
+    """
+    def add_moves(self, start_sq, targets, moves):
+        piece_at = self.piece_at
+        prefix = piece_at[start_sq] << 16 | start_sq << 6
+        while targets:
+            end = targets & -targets
+            targets ^= end
+            end_sq = end.bit_length() - 1
+            key = prefix | piece_at[end_sq] << 12 | end_sq
+            move = _moves.get(key)
+            if move is None:
+                move = _moves[key] = Move(divmod(start_sq, 8), divmod(end_sq, 8), self.board)
+            moves.append(move)
+
+    """
+    Check a single move for legality by looking only at the piece on its start square
+    """
+    def is_valid_move(self, move):
+        start_sq = move.move_id >> 6
+        end_sq = move.move_id & 63
+        piece = self.piece_at[start_sq]
+        if piece == EMPTY or (piece < 6) != self.white_to_move or PIECES[piece] != move.piece_moved or \
+                self.board[move.end_row][move.end_column] != move.piece_captured:
+            return False
+        king_sq, checkers, pins = self.get_checks_and_pins()
+        side = WHITE if self.white_to_move else BLACK
+        own = self.occupancy[side]
+        enemy = self.occupancy[side ^ 1]
+        end = 1 << end_sq
+        if start_sq == king_sq:
+            return KING_ATTACKS[king_sq] & ~own & end != 0 and \
+                not self.attackers_to(end_sq, side ^ 1, (own | enemy) ^ 1 << king_sq, end)
+        if checkers & (checkers - 1):
+            return False
+        allowed = self.get_piece_targets(start_sq, piece, own, enemy)
+        if checkers:
+            allowed &= BETWEEN[king_sq][checkers.bit_length() - 1] | checkers
+        if start_sq in pins:
+            allowed &= pins[start_sq]
+        return allowed & end != 0
@@ -0,0 +1,145 @@
+"""
+A compact game state for holding many games at once or forking positions during analysis. The board is a
+64 byte bytearray of piece codes, the move history an array of 16-bit packed moves and the repetition keys an
+array of 64-bit integers, so copy() is three buffer copies instead of a deepcopy of lists and Move objects.
+It only stores the game, move generation and search go through to_game_state().
+"""
+
+import sys
+from array import array
+
+from Chess.ChessEngine import GameState, Move
+from Chess.zobrist import PIECE_KEYS, PIECES, SIDE_KEY, compute_key
+
+PIECE_NAMES = ("--",) + PIECES  # Square codes: 0 empty, 1 to 12 the pieces in PIECES order
+PIECE_CODES = {piece: code for code, piece in enumerate(PIECE_NAMES)}
+START_SQUARES = bytes(PIECE_CODES[piece] for row in GameState().board for piece in row)
+
+
+class CompactGameState:
+    __slots__ = ("squares", "white_to_move", "moves", "zobrist_key", "key_log", "start_halfmove_clock",
+                 "start_fullmove_number")
+
+    def __init__(self, squares=None, white_to_move=True, moves=None, zobrist_key=None, key_log=None,
+                 start_halfmove_clock=0, start_fullmove_number=1):
+        self.squares = bytearray(squares if squares is not None else START_SQUARES)
+        self.white_to_move = white_to_move
+        # Each move is packed as the captured piece code << 12 | move_id, enough to undo it
+        self.moves = array("H", moves or ())
+        self.zobrist_key = zobrist_key if zobrist_key is not None else compute_key(self.board(), white_to_move)
+        self.key_log = array("Q", key_log or ())  # Keys of the positions before each move, for repetitions
+        # Move counters of the position before the first move, like GameState's
+        self.start_halfmove_clock = start_halfmove_clock
+        self.start_fullmove_number = start_fullmove_number
+
+    @classmethod
+    def from_game_state(cls, game_state):
+        squares = bytes(PIECE_CODES[piece] for row in game_state.board for piece in row)
+        moves = [PIECE_CODES[move.piece_captured] << 12 | move.move_id for move in game_state.move_log]
+        return cls(squares, game_state.white_to_move, moves, game_state.zobrist_key, game_state.key_log,
+                   game_state.start_halfmove_clock, game_state.start_fullmove_number)
+
+    @classmethod
+    def from_fen(cls, fen):
+        return cls.from_game_state(GameState.from_fen(fen))
+
+    """
+    A GameState for the current position with its move counters. By default it only has the repetition history,
+    which is all the search needs; with_history replays the whole game so the move log is filled in too
+    """
+    def to_game_state(self, with_history=False):
+        if not with_history:
+            game_state = GameState(self.board(), self.white_to_move, *self.move_counters())
+            game_state.key_log = list(self.key_log)
+            return game_state
+        start = self.copy()
+        while start.moves:
+            start.undo_move()
+        game_state = GameState(start.board(), start.white_to_move, self.start_halfmove_clock,
+                               self.start_fullmove_number)
+        game_state.key_log = list(start.key_log)
+        for packed in self.moves:
+            game_state.make_move(Move.from_id(packed & 0xFFF, game_state.board))
+        return game_state
+
+    """
+    The (halfmove clock, fullmove number) of the current position, counted on from the starting position's
+    """
+    def move_counters(self):
+        plies = len(self.moves)
+        started_white = self.white_to_move == (plies % 2 == 0)
+        fullmove_number = self.start_fullmove_number + (plies + (0 if started_white else 1)) // 2
+        halfmove_clock = 0
+        position = self.copy()
+        while position.moves:
+            packed = position.moves[-1]
+            if packed >> 12 or PIECE_NAMES[position.squares[packed & 63]][1] == "p":
+                return halfmove_clock, fullmove_number  # The last capture or pawn move resets the clock
+            position.undo_move()
+            halfmove_clock += 1
+        return halfmove_clock + self.start_halfmove_clock, fullmove_number
+
+    """
+    A snapshot of the game that shares nothing with it, safe to change on its own
+    """
+    def copy(self):
+        clone = CompactGameState.__new__(CompactGameState)
+        clone.squares = bytearray(self.squares)
+        clone.white_to_move = self.white_to_move
+        clone.moves = array("H", self.moves)
+        clone.zobrist_key = self.zobrist_key
+        clone.key_log = array("Q", self.key_log)
+        clone.start_halfmove_clock = self.start_halfmove_clock
+        clone.start_fullmove_number = self.start_fullmove_number
+        return clone
+
+    __copy__ = copy
+
+    def board(self):
+        return [[PIECE_NAMES[code] for code in self.squares[row * 8:row * 8 + 8]] for row in range(8)]
+
+    """
+    Play a move given by its move_id (see Move.move_id), the move has to be valid
+    """
+    def make_move(self, move_id):
+        start_sq, end_sq = move_id >> 6, move_id & 63
+        moved, captured = self.squares[start_sq], self.squares[end_sq]
+        self.squares[end_sq] = moved
+        self.squares[start_sq] = 0
+        self.moves.append(captured << 12 | move_id)
+        self.key_log.append(self.zobrist_key)
+        moved_keys = PIECE_KEYS[PIECE_NAMES[moved]]
+        self.zobrist_key ^= moved_keys[start_sq] ^ moved_keys[end_sq] ^ SIDE_KEY
+        if captured:
+            self.zobrist_key ^= PIECE_KEYS[PIECE_NAMES[captured]][end_sq]
+        self.white_to_move = not self.white_to_move
+
+    def undo_move(self):
+        if not self.moves:
+            return
+        packed = self.moves.pop()
+        start_sq, end_sq = packed >> 6 & 63, packed & 63
+        self.squares[start_sq] = self.squares[end_sq]
+        self.squares[end_sq] = packed >> 12
+        self.zobrist_key = self.key_log.pop()
+        self.white_to_move = not self.white_to_move
+
+    """
+    Bytes used by this game's objects
+    """
+    def memory_size(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.squares) + sys.getsizeof(self.moves) + \
+            sys.getsizeof(self.key_log) + sys.getsizeof(self.zobrist_key)
+
+    def __getstate__(self):
+        return (bytes(self.squares), self.white_to_move, self.moves.tobytes(), self.zobrist_key,
+                self.key_log.tobytes(), self.start_halfmove_clock, self.start_fullmove_number)
+
+    def __setstate__(self, state):
+        squares, self.white_to_move, moves, self.zobrist_key, key_log, self.start_halfmove_clock, \
+            self.start_fullmove_number = state
+        self.squares = bytearray(squares)
+        self.moves = array("H")
+        self.moves.frombytes(moves)
+        self.key_log = array("Q")
+        self.key_log.frombytes(key_log)
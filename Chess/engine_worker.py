@@ -0,0 +1,96 @@
+"""
+Runs engine work (valid move generation and searches) on a background thread so the pygame event loop never
+waits for it. The GUI puts requests on a queue and picks up the responses once per frame with poll().
+Every request is tagged with a generation number, cancel() bumps it so stale work is stopped or dropped.
+"""
+
+import copy
+import queue
+import threading
+
+from Chess.bitbase import open_bitbase
+from Chess.movecache import MoveCache
+from Chess.search import Searcher
+
+VALID_MOVES = "valid_moves"
+PROGRESS = "progress"
+BEST_MOVE = "best_move"
+
+
+class EngineWorker:
+    def __init__(self, hash_size_mb=16):
+        self.requests = queue.Queue()
+        self.responses = queue.Queue()
+        self.searcher = Searcher(hash_size_mb, open_bitbase())
+        self.move_cache = MoveCache()  # Undoing and redoing moves in the GUI revisits the same positions
+        self.generation = 0
+        self.thread = threading.Thread(target=self.run, name="engine-worker", daemon=True)
+        self.thread.start()
+
+    """
+    Ask for the valid moves of the position, answered with a VALID_MOVES response holding a set of moves
+    """
+    def request_valid_moves(self, game_state):
+        self.requests.put((VALID_MOVES, self.generation, copy.deepcopy(game_state), None))
+
+    """
+    Ask for a search of at most time_limit seconds, answered with PROGRESS responses after every completed
+    depth and a final BEST_MOVE response, both holding a SearchResult
+    """
+    def request_search(self, game_state, time_limit):
+        self.requests.put((BEST_MOVE, self.generation, copy.deepcopy(game_state), time_limit))
+
+    """
+    Drop every pending request and stop the running search, responses for them are never returned by poll
+    """
+    def cancel(self):
+        self.generation += 1
+        self.searcher.stop()
+        try:
+            while True:
+                self.requests.get_nowait()
+        except queue.Empty:
+            pass
+
+    """
+    Returns the (kind, payload) responses that arrived since the last call, skipping cancelled work
+    """
+    def poll(self):
+        responses = []
+        try:
+            while True:
+                kind, generation, payload = self.responses.get_nowait()
+                if generation == self.generation:
+                    responses.append((kind, payload))
+        except queue.Empty:
+            pass
+        return responses
+
+    def shutdown(self):
+        self.cancel()
+        self.requests.put(None)
+        self.thread.join()
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            kind, generation, game_state, time_limit = request
+            if generation != self.generation:
+                continue  # Cancelled while waiting in the queue
+
+            if kind == VALID_MOVES:
+                game_state.move_cache = self.move_cache
+                self.responses.put((VALID_MOVES, generation, set(game_state.get_valid_moves())))
+            elif kind == BEST_MOVE:
+                def report_progress(result):
+                    self.responses.put((PROGRESS, generation, result))
+
+                # Polled by the search, so a cancel() that lands before the search has started still stops it
+                def cancelled():
+                    return self.generation != generation
+
+                result = self.searcher.search(game_state, time_limit=time_limit, info_callback=report_progress,
+                                              stop_check=cancelled)
+                self.responses.put((BEST_MOVE, generation, result))
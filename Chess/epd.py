@@ -0,0 +1,97 @@
+"""
+Streaming reader for EPD files (test suites, perft suites, training positions). The file is memory-mapped and
+parsed one line at a time, so multi-million-line files start yielding positions straight away and never have to
+fit in memory.
+"""
+
+import mmap
+
+
+class EpdRecord:
+    __slots__ = ("fen", "operations", "line_number")
+
+    def __init__(self, fen, operations, line_number):
+        self.fen = fen
+        self.operations = operations  # Opcode -> list of operands, like {"bm": ["e4"], "D1": ["20"]}
+        self.line_number = line_number
+
+    def __repr__(self):
+        return f"EpdRecord({self.fen!r}, {self.operations!r})"
+
+
+'''
+Parse one EPD line into an EpdRecord, returns None for blank lines and comments
+'''
+def parse_epd(line, line_number=0):
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"EPD line {line_number} needs 4 position fields: {line!r}")
+
+    operations = {}
+    for operation in _split_operations(fields[4] if len(fields) > 4 else ""):
+        opcode, *operands = _split_operands(operation)
+        operations[opcode] = operands
+
+    # EPD has no move counters, they come from the hmvc and fmvn operations when present
+    halfmove_clock = operations.get("hmvc", ["0"])[0]
+    fullmove_number = operations.get("fmvn", ["1"])[0]
+    fen = " ".join(fields[:4]) + f" {halfmove_clock} {fullmove_number}"
+    return EpdRecord(fen, operations, line_number)
+
+
+'''
+Lazily yield an EpdRecord for every position in the file
+'''
+def read_epd(path):
+    with open(path, "rb") as file:
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty files can't be mapped
+            return
+        with mapped:
+            for line_number, line in enumerate(iter(mapped.readline, b""), 1):
+                record = parse_epd(line.decode("ascii", "replace"), line_number)
+                if record is not None:
+                    yield record
+
+
+'''
+Split on the semicolons that end each operation, ignoring the ones inside quoted strings
+'''
+def _split_operations(text):
+    operations = []
+    current = ""
+    quoted = False
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        if char == ";" and not quoted:
+            if current.strip():
+                operations.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        operations.append(current.strip())
+    return operations
+
+
+def _split_operands(operation):
+    tokens = []
+    current = ""
+    quoted = False
+    for char in operation:
+        if char == '"':
+            quoted = not quoted
+        elif char.isspace() and not quoted:
+            if current:
+                tokens.append(current)
+            current = ""
+        else:
+            current += char
+    if current:
+        tokens.append(current)
+    return tokens
@@ -0,0 +1,329 @@
+"""
+Position evaluation with material and piece-square tables, tapered between midgame and endgame by the amount of
+material left. evaluate() is the single position fast path used by the search,
+it reads the totals GameState keeps up to date in make_move and undo_move. evaluate_batch() scores many
+positions at once with NumPy and adds mobility and pawn structure terms.
+NumPy is only needed for the batch functions.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # The search only needs evaluate(), which is pure python
+    np = None
+
+from Chess.zobrist import PIECES
+
+PIECE_VALUES = {"p": 100, "N": 320, "B": 330, "R": 500, "Q": 900, "K": 0}
+
+# Piece-square tables from white's point of view, indexed row * 8 + col with row 0 being the 8th rank.
+# Black uses the same tables mirrored vertically.
+PAWN_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+PAWN_ENDGAME_TABLE = (  # In the endgame only getting closer to promotion counts
+    0, 0, 0, 0, 0, 0, 0, 0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    20, 20, 20, 20, 20, 20, 20, 20,
+    10, 10, 10, 10, 10, 10, 10, 10,
+    5, 5, 5, 5, 5, 5, 5, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+ROOK_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0,
+)
+QUEEN_TABLE = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+)
+KING_TABLE = (  # Stay behind the pawns while there are pieces around
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20,
+)
+KING_ENDGAME_TABLE = (  # Come to the center once the pieces are traded off
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+MIDGAME_TABLES = {"p": PAWN_TABLE, "N": KNIGHT_TABLE, "B": BISHOP_TABLE, "R": ROOK_TABLE, "Q": QUEEN_TABLE,
+                  "K": KING_TABLE}
+ENDGAME_TABLES = {"p": PAWN_ENDGAME_TABLE, "N": KNIGHT_TABLE, "B": BISHOP_TABLE, "R": ROOK_TABLE, "Q": QUEEN_TABLE,
+                  "K": KING_ENDGAME_TABLE}
+
+# The game phase goes from 24 with all pieces on the board down to 0 with only kings and pawns
+PHASE_WEIGHTS = {"p": 0, "N": 1, "B": 1, "R": 2, "Q": 4, "K": 0}
+MAX_PHASE = 24
+
+KNOWN_WIN_SCORE = 10000  # Added for bitbase wins, above any material balance but below the mate scores
+
+MOBILITY_WEIGHTS = {"N": 4, "B": 5, "R": 2, "Q": 1}  # Per reachable square
+DOUBLED_PAWN_PENALTY = 15
+ISOLATED_PAWN_PENALTY = 12
+PASSED_PAWN_BONUS = (0, 90, 60, 40, 25, 15, 10, 0)  # By row for white, mirrored for black
+
+# Board encoding for the batch functions: 0 empty, 1 to 6 white p N B R Q K, -1 to -6 black
+PIECE_CODES = {piece: (i % 6 + 1) * (1 if piece[0] == "w" else -1) for i, piece in enumerate(PIECES)}
+PIECE_CODES["--"] = 0
+
+
+def _signed_scores(tables):
+    # Material plus table value for every piece on every square, negative for black
+    scores = {}
+    for piece in PIECES:
+        table = tables[piece[1]]
+        if piece[0] == "w":
+            scores[piece] = [PIECE_VALUES[piece[1]] + table[sq] for sq in range(64)]
+        else:
+            scores[piece] = [-(PIECE_VALUES[piece[1]] + table[(7 - sq // 8) * 8 + sq % 8]) for sq in range(64)]
+    return scores
+
+
+MIDGAME_SCORES = _signed_scores(MIDGAME_TABLES)
+ENDGAME_SCORES = _signed_scores(ENDGAME_TABLES)
+
+
+'''
+Blend midgame and endgame scores by the game phase
+'''
+def taper(midgame, endgame, phase):
+    phase = min(phase, MAX_PHASE)
+    return (midgame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+'''
+Material and piece-square tables from the side to move's point of view, the single position fast path.
+O(1), the totals are maintained incrementally by GameState. With a bitbase (see Chess.bitbase) the endings it
+covers score 0 when drawn and KNOWN_WIN_SCORE plus a push towards mate when won
+'''
+def evaluate(game_state, bitbase=None):
+    score = taper(game_state.midgame_score, game_state.endgame_score, game_state.phase)
+    if not game_state.white_to_move:
+        score = -score
+    if bitbase is not None:
+        result = bitbase.probe(game_state)  # 1 win, 0 draw, -1 loss, None if not covered
+        if result == 0:
+            return 0
+        if result is not None:
+            return score + result * (KNOWN_WIN_SCORE + mop_up(game_state))
+    return score
+
+
+'''
+Bonus for the side with the extra piece in a won ending: drive the bare king to the edge and bring the kings
+together, so the search makes progress towards a mate it can't see yet
+'''
+def mop_up(game_state):
+    if len(game_state.piece_locations["w"]) > len(game_state.piece_locations["b"]):
+        strong_king, weak_king = game_state.white_king_location, game_state.black_king_location
+    else:
+        strong_king, weak_king = game_state.black_king_location, game_state.white_king_location
+    edge_distance = max(3 - weak_king[0], weak_king[0] - 4) + max(3 - weak_king[1], weak_king[1] - 4)
+    king_distance = abs(strong_king[0] - weak_king[0]) + abs(strong_king[1] - weak_king[1])
+    return 10 * edge_distance + 4 * (14 - king_distance)
+
+
+'''
+Scan a board for its (midgame, endgame, phase) totals, white's material and table values minus black's
+'''
+def board_scores(board):
+    midgame = endgame = phase = 0
+    for row_index, row in enumerate(board):
+        for col, piece in enumerate(row):
+            if piece != "--":
+                sq = row_index * 8 + col
+                midgame += MIDGAME_SCORES[piece][sq]
+                endgame += ENDGAME_SCORES[piece][sq]
+                phase += PHASE_WEIGHTS[piece[1]]
+    return midgame, endgame, phase
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("NumPy is required for batch evaluation, install it with pip install numpy")
+
+
+'''
+Encode boards (8x8 lists like GameState.board) into an (N, 64) int8 array using PIECE_CODES
+'''
+def encode_boards(boards):
+    _require_numpy()
+    codes = [PIECE_CODES[piece] for board in boards for row in board for piece in row]
+    return np.array(codes, dtype=np.int8).reshape(-1, 64)
+
+
+'''
+Split an (N, 64) encoding into (N, 12, 64) 0/1 planes, one per piece in PIECES order
+'''
+def to_planes(encoded):
+    _require_numpy()
+    plane_codes = np.array([PIECE_CODES[piece] for piece in PIECES], dtype=np.int8)
+    return (encoded[:, None, :] == plane_codes[None, :, None]).astype(np.int8)
+
+
+_tables = None
+
+
+def _batch_tables():
+    # Lookup tables indexed by code + 6, built on first use so importing this module doesn't need NumPy
+    global _tables
+    if _tables is None:
+        from Chess.attacks import DIRECTIONS, KNIGHT_TARGETS, RAYS
+
+        midgame = np.zeros((13, 64), dtype=np.int32)
+        endgame = np.zeros((13, 64), dtype=np.int32)
+        phase = np.zeros(13, dtype=np.int32)
+        for piece in PIECES:
+            midgame[PIECE_CODES[piece] + 6] = MIDGAME_SCORES[piece]
+            endgame[PIECE_CODES[piece] + 6] = ENDGAME_SCORES[piece]
+            phase[PIECE_CODES[piece] + 6] = PHASE_WEIGHTS[piece[1]]
+
+        knight_attacks = np.zeros((64, 64), dtype=np.int32)
+        for sq in range(64):
+            for row, col in KNIGHT_TARGETS[sq // 8][sq % 8]:
+                knight_attacks[sq, row * 8 + col] = 1
+        # Squares along each ray, padded with 64 (an always occupied, never reachable square) to 7 steps
+        rays = np.full((64, len(DIRECTIONS), 7), 64, dtype=np.intp)
+        for sq in range(64):
+            for j in range(len(DIRECTIONS)):
+                for k, (row, col) in enumerate(RAYS[sq // 8][sq % 8][j]):
+                    rays[sq, j, k] = row * 8 + col
+        _tables = midgame, endgame, phase, knight_attacks, rays
+    return _tables
+
+
+'''
+Score a batch of encoded positions (see encode_boards) with one vectorized pass, returns an int32 array of
+scores from white's point of view, or from the side to move's if white_to_move (a bool array) is given.
+With mobility and pawn_structure off the scores are the same as evaluate().
+'''
+def evaluate_batch(encoded, white_to_move=None, mobility=True, pawn_structure=True, chunk_size=1024):
+    _require_numpy()
+    encoded = np.asarray(encoded, dtype=np.int8).reshape(-1, 64)
+    scores = np.empty(len(encoded), dtype=np.int32)
+    for start in range(0, len(encoded), chunk_size):  # Chunks keep the ray arrays of the mobility term small
+        chunk = encoded[start:start + chunk_size]
+        scores[start:start + chunk_size] = _evaluate_chunk(chunk, mobility, pawn_structure)
+    if white_to_move is not None:
+        scores = np.where(np.asarray(white_to_move, dtype=bool), scores, -scores)
+    return scores
+
+
+def _evaluate_chunk(encoded, mobility, pawn_structure):
+    midgame_table, endgame_table, phase_table, knight_attacks, rays = _batch_tables()
+    index = encoded.astype(np.intp) + 6
+    squares = np.arange(64)
+    midgame = midgame_table[index, squares].sum(axis=1)
+    endgame = endgame_table[index, squares].sum(axis=1)
+    phase = np.minimum(phase_table[index].sum(axis=1), MAX_PHASE)
+    scores = (midgame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+
+    if mobility:
+        scores += _mobility(encoded, knight_attacks, rays)
+    if pawn_structure:
+        board = encoded.reshape(-1, 8, 8)
+        scores += _pawn_structure(board) - _pawn_structure(-board[:, ::-1, :])
+    return scores.astype(np.int32)
+
+
+def _mobility(encoded, knight_attacks, rays):
+    count = len(encoded)
+    white = encoded > 0
+    black = encoded < 0
+    score = np.zeros(count, dtype=np.int64)
+
+    # Sliders: only the squares holding one are looked at. Square 64 is padding with code 7, it ends every short
+    # ray like an occupied square but can't be captured by either side.
+    position, square = np.nonzero((np.abs(encoded) >= 3) & (np.abs(encoded) <= 5))
+    if len(position):
+        pieces = encoded[position, square].astype(np.intp)
+        padded = np.concatenate([encoded, np.full((count, 1), 7, dtype=np.int8)], axis=1)
+        targets = padded[position[:, None, None], rays[square]]  # (M, 8, 7) codes along every ray
+        empty_run = np.logical_and.accumulate(targets == 0, axis=2).sum(axis=2)  # (M, 8) empty squares per ray
+        blocker = np.take_along_axis(targets, np.minimum(empty_run, 6)[..., None], axis=2)[..., 0]
+        capture = (blocker != 7) & (blocker * np.sign(pieces)[:, None] < 0)
+        directions = np.zeros((13, 8), dtype=np.int64)  # Mobility weight per direction, indexed by code + 6
+        for piece, piece_directions in (("B", slice(4, 8)), ("R", slice(0, 4)), ("Q", slice(0, 8))):
+            directions[PIECE_CODES["w" + piece] + 6, piece_directions] = MOBILITY_WEIGHTS[piece]
+            directions[PIECE_CODES["b" + piece] + 6, piece_directions] = -MOBILITY_WEIGHTS[piece]
+        slider_scores = ((empty_run + capture) * directions[pieces + 6]).sum(axis=1)
+        score += np.bincount(position, slider_scores, minlength=count).astype(np.int64)
+
+    # Knights: how many knights attack every square, counted where the square isn't the knight's own side
+    white_knight_targets = (encoded == PIECE_CODES["wN"]).astype(np.int32) @ knight_attacks
+    black_knight_targets = (encoded == PIECE_CODES["bN"]).astype(np.int32) @ knight_attacks
+    score += MOBILITY_WEIGHTS["N"] * (white_knight_targets * ~white).sum(axis=1)
+    score -= MOBILITY_WEIGHTS["N"] * (black_knight_targets * ~black).sum(axis=1)
+    return score
+
+
+def _pawn_structure(board):
+    # Scored for the side with code 1 pawns moving towards row 0, black is scored on a negated, flipped board
+    own = board == 1
+    enemy = board == -1
+    files = own.sum(axis=1)  # (N, 8) pawns per file
+
+    doubled = np.maximum(files - 1, 0).sum(axis=1)
+    padded = np.pad(files, ((0, 0), (1, 1)))
+    neighbours = padded[:, :-2] + padded[:, 2:]
+    isolated = (files * (neighbours == 0)).sum(axis=1)
+
+    # A pawn is passed when no enemy pawn stands in front of it on its own or a neighbouring file
+    rows = np.arange(8)[None, :, None]
+    furthest_enemy = np.where(enemy, rows, 8).min(axis=1)  # (N, 8) smallest row of an enemy pawn per file
+    padded = np.pad(furthest_enemy, ((0, 0), (1, 1)), constant_values=8)
+    blocking = np.minimum(np.minimum(padded[:, :-2], padded[:, 1:-1]), padded[:, 2:])
+    passed = own & (blocking[:, None, :] >= rows)
+    passed_bonus = (passed * np.array(PASSED_PAWN_BONUS)[None, :, None]).sum(axis=(1, 2))
+    return passed_bonus - DOUBLED_PAWN_PENALTY * doubled - ISOLATED_PAWN_PENALTY * isolated
@@ -0,0 +1,52 @@
+"""
+Bounded least-recently-used cache of legal move lists, keyed by position hash. Set one as GameState.move_cache
+and get_valid_moves() answers positions it has seen before (after an undo, a redo or a transposition) with a
+dict lookup instead of the pin/check scan and move generation.
+"""
+
+from collections import OrderedDict
+
+
+class MoveCache:
+    def __init__(self, max_entries=4096):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # Oldest first, a hit moves the entry to the end
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    """
+    The stored entry for the key or None, a hit makes it the most recently used
+    """
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    """
+    Counters for the cache as a dict, hit_rate is between 0 and 1
+    """
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries), "max_entries": self.max_entries, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,158 @@
+"""
+Perft (performance test) for the move generator. Walks the game tree to a fixed depth with get_valid_moves,
+make_move and undo_move and counts the leaf nodes, which can be compared against known reference counts.
+Run it with ``python -m Chess.perft`` from the repository root.
+"""
+
+import argparse
+import contextlib
+import sys
+import time
+
+from Chess import ChessEngine
+from Chess.ChessEngine import START_FEN
+from Chess.bitboard import BitboardGameState
+from Chess.epd import read_epd
+
+BACKENDS = {"mailbox": ChessEngine.GameState, "bitboard": BitboardGameState}
+
+# Standard reference positions with their published node counts. The engine has no castling, en-passant or
+# promotion yet, so only the depths where none of those moves occur in the tree are listed.
+REFERENCE_POSITIONS = [
+    ("startpos", START_FEN, {1: 20, 2: 400, 3: 8902, 4: 197281}),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", {1: 14, 2: 191}),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", {1: 6}),
+    ("position 4 mirrored", "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1", {1: 6}),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890}),
+]
+
+
+'''
+Build a game state of the given backend from a FEN string
+'''
+def load_position(fen, backend="mailbox"):
+    return BACKENDS[backend].from_fen(fen)
+
+
+'''
+Count the leaf nodes of the game tree at the given depth
+'''
+def perft(game_state, depth):
+    if depth == 0:
+        return 1
+    moves = game_state.get_valid_moves()
+    if depth == 1:
+        return len(moves)  # Bulk counting, no need to make the last moves
+
+    nodes = 0
+    for move in moves:
+        game_state.make_move(move)
+        nodes += perft(game_state, depth - 1)
+        game_state.undo_move()
+    return nodes
+
+
+'''
+Perft split by root move, returns a dictionary of move notation -> leaf node count
+'''
+def divide(game_state, depth):
+    counts = {}
+    for move in game_state.get_valid_moves():
+        game_state.make_move(move)
+        counts[move.get_chess_notation()] = perft(game_state, depth - 1)
+        game_state.undo_move()
+    return counts
+
+
+'''
+Run perft on a single position and print the node count and speed, returns the node count
+'''
+def run_perft(fen, depth, show_divide=False, backend="mailbox", out=sys.stdout):
+    game_state = load_position(fen, backend)
+    start = time.perf_counter()
+    if show_divide:
+        counts = divide(game_state, depth)
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(game_state, depth)
+    elapsed = time.perf_counter() - start
+
+    if show_divide:
+        for notation in sorted(counts):
+            print(f"{notation}: {counts[notation]}", file=out)
+    print(f"depth {depth}: {nodes} nodes in {elapsed:.3f}s ({nodes_per_second(nodes, elapsed):.0f} nps)", file=out)
+    return nodes
+
+
+'''
+Yield (name, fen, {depth: nodes}) for the positions of a perft EPD file, counts given as "D1 20; D2 400" operations
+'''
+def epd_positions(path):
+    for record in read_epd(path):
+        counts = {int(opcode[1:]): int(operands[0]) for opcode, operands in record.operations.items()
+                  if opcode[0] == "D" and opcode[1:].isdigit() and operands}
+        name = record.operations.get("id", [f"line {record.line_number}"])[0]
+        yield name, record.fen, counts
+
+
+'''
+Run every reference position up to max_depth, returns True if all node counts match
+'''
+def run_suite(max_depth=3, backend="mailbox", positions=REFERENCE_POSITIONS, out=sys.stdout):
+    passed = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected_counts in positions:
+        for depth, expected in sorted(expected_counts.items()):
+            if depth > max_depth:
+                break
+            game_state = load_position(fen, backend)
+            start = time.perf_counter()
+            nodes = perft(game_state, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+
+            status = "ok" if nodes == expected else f"FAIL (expected {expected})"
+            passed = passed and nodes == expected
+            print(f"{name} depth {depth}: {nodes} nodes in {elapsed:.3f}s "
+                  f"({nodes_per_second(nodes, elapsed):.0f} nps) {status}", file=out)
+
+    print(f"total: {total_nodes} nodes in {total_time:.3f}s ({nodes_per_second(total_nodes, total_time):.0f} nps)",
+          file=out)
+    return passed
+
+
+def nodes_per_second(nodes, elapsed):
+    return nodes / elapsed if elapsed > 0 else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count move generator leaf nodes (perft)")
+    parser.add_argument("--fen", default=START_FEN, help="position to search from (default: start position)")
+    parser.add_argument("--depth", type=int, default=3, help="search depth in plies")
+    parser.add_argument("--divide", action="store_true", help="print the node count for every root move")
+    parser.add_argument("--suite", action="store_true",
+                        help="check the reference positions up to --depth instead of a single position")
+    parser.add_argument("--epd", help="with --suite, check the positions of a perft EPD file instead")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="mailbox", help="board representation to test")
+    parser.add_argument("--profile", action="store_true", help="print call counts and times of the mailbox hot paths")
+    parser.add_argument("--cprofile", metavar="FILE", help="also dump a cProfile of the run to FILE for pstats")
+    args = parser.parse_args(argv)
+
+    profiling = args.profile or args.cprofile is not None
+    with ChessEngine.EngineProfiler(args.cprofile) if profiling else contextlib.nullcontext() as profiler:
+        if args.suite:
+            positions = epd_positions(args.epd) if args.epd else REFERENCE_POSITIONS
+            passed = run_suite(args.depth, args.backend, positions)
+        else:
+            run_perft(args.fen, args.depth, args.divide, args.backend)
+            passed = True
+    if profiling:
+        print(ChessEngine.format_profile(profiler.snapshot), file=sys.stderr)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
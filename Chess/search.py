@@ -0,0 +1,328 @@
+"""
+Alpha-beta search on top of GameState or BitboardGameState. Negamax with iterative deepening, a transposition
+table, quiescence search on captures and move ordering by hash move, MVV-LVA captures, killer moves and the history
+heuristic.
+The search can be limited by depth, time or node count and always returns the best move found so far.
+Run it with ``python -m Chess.search`` from the repository root.
+"""
+
+import argparse
+import contextlib
+import sys
+import time
+
+from Chess import bitbase
+from Chess.ChessEngine import START_FEN, EngineProfiler, GameState, Move, format_profile, mvv_lva
+from Chess.bitboard import BitboardGameState
+from Chess.evaluation import evaluate
+from Chess.zobrist import EXACT, LOWER, UPPER, TranspositionTable
+
+MATE_SCORE = 100000
+MATE_BOUND = MATE_SCORE - 1000  # Scores beyond this are mates, counted in plies from the root
+INFINITY = MATE_SCORE + 1
+MAX_PLY = 128
+CHECK_EVERY = 127  # Check the clock and the stop flag every 128 nodes, a few milliseconds
+
+
+class SearchResult:
+    def __init__(self, best_move, score, depth, nodes, elapsed, pv):
+        self.best_move = best_move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.pv = pv
+
+    @property
+    def nps(self):
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    """
+    Mate distance in moves (negative when getting mated), or None if the score is not a mate
+    """
+    @property
+    def mate_in(self):
+        if abs(self.score) < MATE_BOUND:
+            return None
+        plies = MATE_SCORE - abs(self.score)
+        return (plies + 1) // 2 if self.score > 0 else -((plies + 1) // 2)
+
+    def __repr__(self):
+        pv = " ".join(move.get_chess_notation() for move in self.pv)
+        return f"SearchResult(depth={self.depth}, score={self.score}, nodes={self.nodes}, nps={self.nps}, pv={pv})"
+
+
+class Searcher:
+    def __init__(self, hash_size_mb=16, bitbase=None):
+        self.transposition_table = TranspositionTable(hash_size_mb)
+        self.bitbase = bitbase  # A Chess.bitbase.Bitbase for exact endgame results, optional
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [[0] * 4096, [0] * 4096]  # Indexed by side (0 white) and move_id
+        self.nodes = 0
+        self.stopped = False
+        self.stop_requested = False
+        self.stop_check = None
+        self.deadline = None
+        self.node_limit = None
+
+    """
+    Forget everything learned in earlier searches, for a new game
+    """
+    def clear(self):
+        self.transposition_table.clear()
+        self.history = [[0] * 4096, [0] * 4096]
+
+    """
+    Ask a running search to return as soon as possible, safe to call from another thread
+    """
+    def stop(self):
+        self.stop_requested = True
+
+    """
+    Iterative deepening search, returns a SearchResult for the deepest completed (or partially searched) depth.
+    info_callback, if given, is called with a SearchResult after every completed depth.
+    stop_check, if given, is polled with the clock and stops the search once it returns True; unlike stop() it
+    can't be missed by a caller that cancels just before the search starts.
+    """
+    def search(self, game_state, max_depth=MAX_PLY - 1, time_limit=None, node_limit=None, info_callback=None,
+               stop_check=None):
+        start = time.perf_counter()
+        self.nodes = 0
+        self.stopped = False
+        self.stop_requested = False
+        self.stop_check = stop_check
+        self.deadline = start + time_limit if time_limit is not None else None
+        self.node_limit = node_limit
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        for side_history in self.history:  # Age the history so older searches count less
+            for i in range(4096):
+                side_history[i] >>= 3
+
+        root_moves = game_state.get_valid_moves()
+        if not root_moves:
+            score = -MATE_SCORE if game_state.in_check else 0
+            return SearchResult(None, score, 0, 0, time.perf_counter() - start, [])
+
+        result = SearchResult(root_moves[0], 0, 0, 0, 0.0, [root_moves[0]])
+        for depth in range(1, min(max_depth, MAX_PLY - 1) + 1):
+            best_move, score = self.search_root(game_state, root_moves, depth)
+            elapsed = time.perf_counter() - start
+            if best_move is not None:
+                pv = self.principal_variation(game_state, best_move, depth)
+                result = SearchResult(best_move, score, depth, self.nodes, elapsed, pv)
+            if self.stopped:
+                break
+            if info_callback is not None:
+                info_callback(result)
+            if abs(score) >= MATE_BOUND and MATE_SCORE - abs(score) <= depth:
+                break  # Found a forced mate that the current depth already proves
+
+            # Put the best move first for the next iteration
+            root_moves.remove(best_move)
+            root_moves.insert(0, best_move)
+        result.nodes = self.nodes
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    """
+    Search every root move, returns (best move, score). The best move is kept up to date while searching so an
+    interrupted iteration still reports the best move found so far, or None if no move finished.
+    """
+    def search_root(self, game_state, root_moves, depth):
+        alpha, beta = -INFINITY, INFINITY
+        best_move = None
+        for move in root_moves:
+            game_state.make_move(move)
+            score = -self.negamax(game_state, depth - 1, -beta, -alpha, 1)
+            game_state.undo_move()
+            if self.stopped:
+                break
+            if score > alpha:
+                alpha = score
+                best_move = move
+        if best_move is not None and not self.stopped:
+            self.transposition_table.store(game_state.zobrist_key, depth, alpha, EXACT, best_move.move_id)
+        return best_move, alpha
+
+    def negamax(self, game_state, depth, alpha, beta, ply):
+        if game_state.repetition_count() > 0:
+            return 0  # Repeating a position can't be better than a draw
+        if self.bitbase is not None and self.bitbase.probe(game_state) == bitbase.DRAW:
+            return 0
+        if depth <= 0:
+            return self.quiescence(game_state, alpha, beta, ply)
+
+        self.nodes += 1
+        if self.nodes & CHECK_EVERY == 0 and self.out_of_budget():
+            return 0
+        if ply >= MAX_PLY - 1:
+            return evaluate(game_state, self.bitbase)
+
+        key = game_state.zobrist_key
+        original_alpha = alpha
+        hash_move = 0
+        entry = self.transposition_table.probe(key)
+        if entry is not None:
+            entry_depth, entry_score, bound, hash_move = entry
+            if entry_depth >= depth:
+                entry_score = score_from_table(entry_score, ply)
+                if bound == EXACT or (bound == LOWER and entry_score >= beta) or \
+                        (bound == UPPER and entry_score <= alpha):
+                    return entry_score
+
+        side = 0 if game_state.white_to_move else 1
+        best_score = -INFINITY
+        best_move = 0
+        # Staged generation: a cutoff on the hash move or a capture skips generating the quiet moves
+        for move in game_state.get_valid_moves_staged(hash_move, self.killers[ply], self.history[side]):
+            game_state.make_move(move)
+            score = -self.negamax(game_state, depth - 1, -beta, -alpha, ply + 1)
+            game_state.undo_move()
+            if self.stopped:
+                return 0
+
+            if score > best_score:
+                best_score = score
+                best_move = move.move_id
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if move.piece_captured == "--":  # Quiet move caused a cutoff, remember it
+                            killers = self.killers[ply]
+                            if killers[0] != best_move:
+                                killers[1] = killers[0]
+                                killers[0] = best_move
+                            self.history[side][best_move] += depth * depth
+                        break
+
+        if best_move == 0:  # No valid moves at all
+            return -MATE_SCORE + ply if game_state.in_check else 0
+        if best_score >= beta:
+            bound = LOWER
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.transposition_table.store(key, depth, score_to_table(best_score, ply), bound, best_move)
+        return best_score
+
+    """
+    Only search captures until the position is quiet, so the evaluation is never taken in the middle of an exchange
+    """
+    def quiescence(self, game_state, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & CHECK_EVERY == 0 and self.out_of_budget():
+            return 0
+
+        moves = game_state.get_valid_moves(quiets=False)
+        if game_state.in_check:
+            moves = game_state.get_valid_moves()  # No standing pat in check, every evasion has to be tried
+            if not moves:
+                return -MATE_SCORE + ply
+            best_score = -INFINITY
+        else:
+            best_score = evaluate(game_state, self.bitbase)
+            if best_score >= beta or ply >= MAX_PLY - 1:
+                return best_score
+            alpha = max(alpha, best_score)
+            moves.sort(key=mvv_lva, reverse=True)
+
+        for move in moves:
+            game_state.make_move(move)
+            score = -self.quiescence(game_state, -beta, -alpha, ply + 1)
+            game_state.undo_move()
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    def out_of_budget(self):
+        if self.stop_requested or (self.node_limit is not None and self.nodes >= self.node_limit) or \
+                (self.deadline is not None and time.perf_counter() >= self.deadline) or \
+                (self.stop_check is not None and self.stop_check()):
+            self.stopped = True
+        return self.stopped
+
+    """
+    Follow the hash moves from the root to recover the principal variation
+    """
+    def principal_variation(self, game_state, best_move, depth):
+        pv = [best_move]
+        game_state.make_move(best_move)
+        seen = {game_state.zobrist_key}
+        while len(pv) < depth:
+            entry = self.transposition_table.probe(game_state.zobrist_key)
+            if entry is None or entry[3] not in game_state.get_valid_move_ids():
+                break
+            move = Move.from_id(entry[3], game_state.board)
+            game_state.make_move(move)
+            pv.append(move)
+            if game_state.zobrist_key in seen:
+                break
+            seen.add(game_state.zobrist_key)
+        for _ in pv:
+            game_state.undo_move()
+        return pv
+
+
+'''
+Mate scores are stored relative to the position rather than the root, so they stay valid at any ply
+'''
+def score_to_table(score, ply):
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search a position and report the best move")
+    parser.add_argument("--fen", default=START_FEN, help="position to search (default: start position)")
+    parser.add_argument("--depth", type=int, default=MAX_PLY - 1, help="maximum depth in plies")
+    parser.add_argument("--movetime", type=float, help="time budget in seconds")
+    parser.add_argument("--nodes", type=int, help="node budget")
+    parser.add_argument("--hash", type=int, default=16, help="transposition table size in MB")
+    parser.add_argument("--backend", choices=("bitboard", "mailbox"), default="mailbox",
+                        help="board representation to search with")
+    parser.add_argument("--bitbase", default=bitbase.DEFAULT_PATH,
+                        help="endgame bitbase file, used if it exists (default: %(default)s)")
+    parser.add_argument("--profile", action="store_true", help="print call counts and times of the mailbox hot paths")
+    parser.add_argument("--cprofile", metavar="FILE", help="also dump a cProfile of the search to FILE for pstats")
+    args = parser.parse_args(argv)
+    if args.backend == "bitboard" and args.profile:
+        parser.error("--profile only counts the mailbox GameState, use --backend mailbox (--cprofile works for both)")
+    if args.movetime is None and args.nodes is None and args.depth == MAX_PLY - 1:
+        args.movetime = 5.0  # Without any limit the search would never end
+
+    def print_info(result):
+        pv = " ".join(move.get_chess_notation() for move in result.pv)
+        print(f"depth {result.depth} score {result.score} nodes {result.nodes} nps {result.nps} pv {pv}")
+
+    searcher = Searcher(args.hash, bitbase.open_bitbase(args.bitbase))
+    profiling = args.profile or args.cprofile is not None
+    with EngineProfiler(args.cprofile) if profiling else contextlib.nullcontext() as profiler:
+        game_state_class = BitboardGameState if args.backend == "bitboard" else GameState
+        result = searcher.search(game_state_class.from_fen(args.fen), args.depth, args.movetime, args.nodes, print_info)
+    best = result.best_move.get_chess_notation() if result.best_move is not None else "(none)"
+    print(f"bestmove {best} depth {result.depth} nodes {result.nodes} time {result.elapsed:.3f}s nps {result.nps}")
+    if profiling and args.backend == "mailbox":
+        print(format_profile(profiler.snapshot), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
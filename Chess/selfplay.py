@@ -0,0 +1,188 @@
+"""
+Headless engine-vs-engine games for regression testing. Games are spread over a process pool, every worker
+plays one game at a time on its own GameState, and each finished game is appended to a PGN or JSON lines file
+as soon as it comes back, so nothing is held in memory. Only the engine is imported, never pygame.
+Run it with ``python -m Chess.selfplay`` from the repository root.
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from Chess.bitbase import open_bitbase
+from Chess.ChessEngine import GameState
+from Chess.polyglot import PolyglotBook
+from Chess.search import Searcher
+
+_searcher = None  # One per worker process, created by _init_worker
+_book = None  # Every worker maps the same book file, so its pages are shared between them
+
+
+def _init_worker(hash_size_mb, book_path=None):
+    global _searcher, _book
+    _searcher = Searcher(hash_size_mb, open_bitbase())
+    _book = PolyglotBook(book_path) if book_path else None
+
+
+'''
+Play one game from the start position, returns a dict with the moves in SAN and the result.
+Moves come from the opening book while the position is in it. The first random_plies moves are picked at random
+(seeded by the game) so games don't all repeat each other.
+'''
+def play_game(spec):
+    index, seed, random_plies, max_plies, depth, movetime, nodes = spec
+    rng = random.Random(seed)
+    _searcher.clear()  # Nothing carries over from the worker's previous game, so games are reproducible
+    game_state = GameState()
+    san_moves = []
+    total_nodes = 0
+    start = time.perf_counter()
+    result, termination = "1/2-1/2", "max plies"
+
+    while len(san_moves) < max_plies:
+        moves = game_state.get_valid_moves()
+        if not moves:
+            if game_state.in_check:
+                result, termination = ("0-1" if game_state.white_to_move else "1-0"), "checkmate"
+            else:
+                termination = "stalemate"
+            break
+        if game_state.repetition_count() >= 2:
+            termination = "threefold repetition"
+            break
+        if insufficient_material(game_state.board):
+            termination = "insufficient material"
+            break
+
+        move = _book.choose_move(game_state, rng=rng) if _book is not None else None
+        if move is None and len(san_moves) < random_plies:
+            move = rng.choice(moves)
+        elif move is None:
+            search_result = _searcher.search(game_state, depth, movetime, nodes)
+            total_nodes += search_result.nodes
+            move = search_result.best_move
+        san_moves.append(move_to_san(game_state, move, moves))
+        game_state.make_move(move)
+
+    return {"game": index, "seed": seed, "result": result, "termination": termination, "plies": len(san_moves),
+            "nodes": total_nodes, "seconds": round(time.perf_counter() - start, 3), "moves": san_moves}
+
+
+'''
+Neither side can mate with bare kings or a single minor piece against a bare king
+'''
+def insufficient_material(board):
+    pieces = [piece for row in board for piece in row if piece != "--" and piece[1] != "K"]
+    return len(pieces) == 0 or (len(pieces) == 1 and pieces[0][1] in "NB")
+
+
+'''
+Standard algebraic notation for a move in the current position, valid_moves are the moves of that position
+'''
+def move_to_san(game_state, move, valid_moves):
+    piece = move.piece_moved[1]
+    capture = move.piece_captured != "--"
+    target = move.get_rank_file(move.end_row, move.end_column)
+    if piece == "p":
+        san = (move.cols_to_files[move.start_column] + "x" if capture else "") + target
+    else:
+        # Other pieces of the same type that can reach the same square make the move ambiguous
+        rivals = [other for other in valid_moves if other.piece_moved == move.piece_moved and
+                  other.move_id & 63 == move.move_id & 63 and other.move_id != move.move_id]
+        disambiguation = ""
+        if rivals:
+            if all(other.start_column != move.start_column for other in rivals):
+                disambiguation = move.cols_to_files[move.start_column]
+            elif all(other.start_row != move.start_row for other in rivals):
+                disambiguation = move.rows_to_ranks[move.start_row]
+            else:
+                disambiguation = move.get_rank_file(move.start_row, move.start_column)
+        san = piece + disambiguation + ("x" if capture else "") + target
+
+    game_state.make_move(move)
+    if not game_state.get_valid_moves():
+        san += "#" if game_state.in_check else ""
+    elif game_state.in_check:
+        san += "+"
+    game_state.undo_move()
+    return san
+
+
+def format_pgn(game, date):
+    headers = [("Event", "mongoChess self-play"), ("Site", "?"), ("Date", date), ("Round", str(game["game"] + 1)),
+               ("White", "mongoChess"), ("Black", "mongoChess"), ("Result", game["result"]),
+               ("Termination", game["termination"]), ("PlyCount", str(game["plies"]))]
+    lines = [f'[{name} "{value}"]' for name, value in headers]
+    lines.append("")
+
+    tokens = []
+    for i, san in enumerate(game["moves"]):
+        tokens.append(f"{i // 2 + 1}. {san}" if i % 2 == 0 else san)
+    tokens.append(game["result"])
+    line = ""
+    for token in tokens:  # PGN lines should stay under 80 characters
+        if line and len(line) + 1 + len(token) > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+'''
+Play games on a process pool and stream each one to the output file as it finishes, returns the score counts
+'''
+def run(output, games, processes=None, output_format=None, seed=0, random_plies=4, max_plies=300, depth=None,
+        movetime=None, nodes=None, hash_size_mb=16, book=None, log=sys.stderr):
+    if output_format is None:
+        output_format = "jsonl" if output.endswith((".jsonl", ".json")) else "pgn"
+    processes = processes or os.cpu_count() or 1
+    if depth is None and movetime is None and nodes is None:
+        nodes = 5000  # Fixed node counts keep the games reproducible
+    max_depth = depth if depth is not None else 127
+    specs = [(index, seed * 1000003 + index, random_plies, max_plies, max_depth, movetime, nodes)
+             for index in range(games)]
+    date = datetime.date.today().strftime("%Y.%m.%d")
+    scores = {"1-0": 0, "0-1": 0, "1/2-1/2": 0}
+
+    start = time.perf_counter()
+    with open(output, "a") as out, multiprocessing.Pool(processes, _init_worker, (hash_size_mb, book)) as pool:
+        for done, game in enumerate(pool.imap_unordered(play_game, specs), 1):
+            out.write(json.dumps(game) + "\n" if output_format == "jsonl" else format_pgn(game, date))
+            out.flush()
+            scores[game["result"]] += 1
+            elapsed = time.perf_counter() - start
+            print(f"{done}/{games} games, +{scores['1-0']} -{scores['0-1']} ={scores['1/2-1/2']}, "
+                  f"{done * 3600 / elapsed:.0f} games/hour", file=log)
+    return scores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine games without the GUI")
+    parser.add_argument("output", help="file to append the games to, .jsonl for JSON lines, anything else for PGN")
+    parser.add_argument("--games", type=int, default=10, help="number of games to play")
+    parser.add_argument("--processes", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--format", choices=("pgn", "jsonl"), help="output format (default: from the extension)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random opening moves")
+    parser.add_argument("--random-plies", type=int, default=4, help="random moves at the start of every game")
+    parser.add_argument("--max-plies", type=int, default=300, help="adjudicate the game as a draw after this")
+    parser.add_argument("--depth", type=int, help="search depth per move")
+    parser.add_argument("--movetime", type=float, help="search time per move in seconds")
+    parser.add_argument("--nodes", type=int, help="search nodes per move (default: 5000 if no other limit is given)")
+    parser.add_argument("--hash", type=int, default=16, help="transposition table size per worker in MB")
+    parser.add_argument("--book", help="Polyglot .bin opening book to play the first moves from")
+    args = parser.parse_args(argv)
+
+    run(args.output, args.games, args.processes, args.format, args.seed, args.random_plies, args.max_plies,
+        args.depth, args.movetime, args.nodes, args.hash, args.book)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
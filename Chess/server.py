@@ -0,0 +1,263 @@
+"""
+Game server for many concurrent games: JSON lines over TCP on the loopback interface, one request object per line
+and one response per request, matched by the request's "id". The games live in this process as CompactGameStates,
+searches run on a process pool so the event loop keeps answering while the engine thinks.
+Run it with ``python -m Chess.server`` from the repository root.
+
+Requests ({"op": ..., "id": ..., arguments}):
+    new [fen]                       start a game, answers its "game" id
+    fork game                       start a new game from a copy of another one
+    state game                      the position as FEN, the side to move and the moves played
+    moves game                      the valid moves
+    move game move                  play a move like "e2e4"
+    undo game                       take back the last move
+    search game [depth] [movetime] [nodes] [play]
+                                    best move from the engine, played on the game if play is true
+    close game                      forget the game
+    metrics [game]                  game count, memory per game and request latencies per op
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Chess.compact import CompactGameState
+from Chess.search import Searcher
+
+DEFAULT_PORT = 8765
+LATENCY_SAMPLES = 1000  # Latencies kept per op for the percentiles
+DEFAULT_NODES = 20000  # Search budget when a request gives no limit
+
+_searcher = None  # One per worker process, created by _init_worker
+
+
+def _init_worker(hash_size_mb):
+    global _searcher
+    _searcher = Searcher(hash_size_mb)
+
+
+'''
+Search a position in a worker process, returns the result as a JSON-ready dict
+'''
+def search_position(game, depth, movetime, nodes):
+    result = _searcher.search(game.to_game_state(), depth, movetime, nodes)
+    best = result.best_move.get_chess_notation() if result.best_move is not None else None
+    return {"best_move": best, "move_id": result.best_move.move_id if result.best_move is not None else None,
+            "score": result.score, "mate_in": result.mate_in, "depth": result.depth, "nodes": result.nodes,
+            "nps": result.nps, "pv": [move.get_chess_notation() for move in result.pv]}
+
+
+class RequestError(Exception):
+    pass
+
+
+'''
+A positive number from the request, None when the field is missing or null
+'''
+def number_field(request, name, types):
+    value = request.get(name)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, types) or value <= 0:
+        raise RequestError(f"{name} must be a positive {'integer' if types is int else 'number'}")
+    return value
+
+
+class GameServer:
+    def __init__(self, processes=None, hash_size_mb=16):
+        self.games = {}  # Game id -> CompactGameState
+        self.next_game_id = 1
+        self.executor = ProcessPoolExecutor(processes or os.cpu_count() or 1, initializer=_init_worker,
+                                            initargs=(hash_size_mb,))
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=LATENCY_SAMPLES))
+        self.request_counts = collections.Counter()
+        self.connections = {}  # Connection handler task -> its writer, closed on shutdown
+        self.handlers = {"new": self.new_game, "fork": self.fork_game, "state": self.game_state,
+                         "moves": self.valid_moves, "move": self.make_move, "undo": self.undo_move,
+                         "search": self.search, "close": self.close_game, "metrics": self.metrics}
+
+    """
+    Serve until cancelled or sent SIGTERM
+    """
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        stopped = asyncio.Event()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set)
+        except (NotImplementedError, AttributeError):  # No signal handlers on Windows event loops
+            pass
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await stopped.wait()
+            # Closing the writers ends every connection's read loop, then let the handlers finish
+            for writer in self.connections.values():
+                writer.close()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+
+    async def handle_connection(self, reader, writer):
+        self.connections[asyncio.current_task()] = writer
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                # Every request runs as its own task, so a long search doesn't hold up the ones behind it
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+            del self.connections[asyncio.current_task()]
+
+    async def respond(self, line, writer):
+        response = await self.handle_request(line)
+        writer.write(json.dumps(response).encode() + b"\n")
+        await writer.drain()
+
+    """
+    Answer one JSON request line, errors are returned as {"error": message} rather than raised
+    """
+    async def handle_request(self, line):
+        start = time.perf_counter()
+        request_id, op = None, "invalid"
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+            request_id = request.get("id")
+            op = request.get("op")
+            if op not in self.handlers:
+                op = "invalid"
+                raise RequestError(f"unknown op {request.get('op')!r}")
+            response = await self.handlers[op](request)
+        except (RequestError, ValueError) as error:
+            response = {"error": str(error)}
+        except Exception as error:  # Any other failure still answers the request
+            response = {"error": f"internal error: {type(error).__name__}: {error}"}
+        response["id"] = request_id
+        self.request_counts[op] += 1
+        self.latencies[op].append(time.perf_counter() - start)
+        return response
+
+    def get_game(self, request):
+        game_id = request.get("game")
+        game = self.games.get(game_id) if type(game_id) is int else None
+        if game is None:
+            raise RequestError(f"no game {game_id!r}")
+        return game
+
+    def add_game(self, game):
+        game_id = self.next_game_id
+        self.next_game_id += 1
+        self.games[game_id] = game
+        return {"game": game_id}
+
+    async def new_game(self, request):
+        fen = request.get("fen")
+        if fen is not None and not isinstance(fen, str):
+            raise RequestError("fen must be a string")
+        return self.add_game(CompactGameState.from_fen(fen) if fen else CompactGameState())
+
+    async def fork_game(self, request):
+        return self.add_game(self.get_game(request).copy())
+
+    async def game_state(self, request):
+        game_state = self.get_game(request).to_game_state(with_history=True)
+        return {"fen": game_state.to_fen(), "white_to_move": game_state.white_to_move,
+                "moves": [move.get_chess_notation() for move in game_state.move_log]}
+
+    async def valid_moves(self, request):
+        moves = self.get_game(request).to_game_state().get_valid_moves()
+        return {"moves": [move.get_chess_notation() for move in moves]}
+
+    async def make_move(self, request):
+        game = self.get_game(request)
+        notation = request.get("move")
+        for move in game.to_game_state().get_valid_moves():
+            if move.get_chess_notation() == notation:
+                game.make_move(move.move_id)
+                return {"ok": True}
+        raise RequestError(f"invalid move {notation!r}")
+
+    async def undo_move(self, request):
+        game = self.get_game(request)
+        if not game.moves:
+            raise RequestError("no move to undo")
+        game.undo_move()
+        return {"ok": True}
+
+    async def search(self, request):
+        game = self.get_game(request)
+        depth = number_field(request, "depth", int)
+        movetime = number_field(request, "movetime", (int, float))
+        nodes = number_field(request, "nodes", int)
+        if depth is None and movetime is None and nodes is None:
+            nodes = DEFAULT_NODES
+        if depth is None:
+            depth = 127
+        key = game.zobrist_key
+        # The worker gets a pickled copy, so the game can take other requests during the search
+        result = await asyncio.get_running_loop().run_in_executor(self.executor, search_position, game.copy(),
+                                                                  depth, movetime, nodes)
+        if request.get("play") and result["move_id"] is not None:
+            if game.zobrist_key != key:
+                raise RequestError("the game changed during the search, the move was not played")
+            game.make_move(result["move_id"])
+        del result["move_id"]
+        return result
+
+    async def close_game(self, request):
+        self.get_game(request)
+        del self.games[request["game"]]
+        return {"ok": True}
+
+    async def metrics(self, request):
+        if request.get("game") is not None:
+            game = self.get_game(request)
+            return {"game": request["game"], "memory_bytes": game.memory_size(), "plies": len(game.moves)}
+        sizes = [game.memory_size() for game in self.games.values()]
+        latencies = {}
+        for op, samples in self.latencies.items():
+            ordered = sorted(samples)
+            latencies[op] = {"count": self.request_counts[op],
+                             "mean_ms": round(sum(ordered) * 1000 / len(ordered), 3),
+                             "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+                             "p99_ms": round(ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)] * 1000, 3),
+                             "max_ms": round(ordered[-1] * 1000, 3)}
+        return {"games": len(self.games), "memory_bytes": sum(sizes),
+                "memory_bytes_per_game": round(sum(sizes) / len(sizes)) if sizes else 0,
+                "max_memory_bytes": max(sizes, default=0), "latency": latencies}
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve many games over JSON lines on a local TCP port")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on (default: loopback only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port")
+    parser.add_argument("--processes", type=int, help="search worker processes (default: one per CPU)")
+    parser.add_argument("--hash", type=int, default=16, help="transposition table size per worker in MB")
+    args = parser.parse_args(argv)
+
+    server = GameServer(args.processes, args.hash)
+    print(f"serving on {args.host}:{args.port}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
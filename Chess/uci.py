@@ -0,0 +1,253 @@
+"""
+UCI front end so the engine can be played from chess GUIs and tournament managers.
+Commands are read on the main thread while the search runs on its own thread, so stop, ponderhit and isready
+are answered in the middle of a search. Only the engine is imported, never pygame.
+Run it with ``python -m Chess.uci`` from the repository root.
+"""
+
+import sys
+import threading
+import time
+
+from Chess.bitbase import Bitbase, open_bitbase
+from Chess.ChessEngine import START_FEN, GameState
+from Chess.polyglot import PolyglotBook
+from Chess.search import MAX_PLY, Searcher
+
+ENGINE_NAME = "mongoChess"
+DEFAULT_HASH_MB = 16
+MOVE_OVERHEAD = 0.05  # Seconds kept back from every move for the GUI and the pipes
+DEFAULT_MOVES_TO_GO = 30  # Moves left to plan for when the time control doesn't say
+
+
+class UciEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()  # The search thread writes info lines too
+        self.searcher = Searcher(DEFAULT_HASH_MB, open_bitbase())
+        self.game_state = GameState()
+        self.search_thread = None
+        self.search_done = threading.Event()  # Set when an infinite or ponder search may report its best move
+        self.pondering = False
+        self.ponder_time_limit = None  # Time for the move if the ponder move gets played
+        self.book = None
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    """
+    Handle one line of input, returns False once the engine should quit
+    """
+    def handle(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_NAME} authors")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max 1024")
+            self.send("option name Ponder type check default false")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name BitbaseFile type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stop_search()
+            self.searcher.clear()
+            self.game_state = GameState()
+        elif command == "setoption":
+            self.set_option(args)
+        elif command == "position":
+            self.stop_search()
+            self.set_position(args)
+        elif command == "go":
+            self.stop_search()
+            self.go(args)
+        elif command == "stop":
+            self.stop_search()
+        elif command == "ponderhit":
+            self.ponder_hit()
+        elif command == "quit":
+            self.stop_search()
+            return False
+        else:
+            self.send(f"info string unknown command {command}")
+        return True
+
+    def set_option(self, args):
+        # setoption name <name> value <value>, the name can have spaces
+        if "name" not in args:
+            return
+        name_end = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1:name_end]).lower()
+        value = " ".join(args[name_end + 1:])
+        if name == "hash":
+            self.stop_search()
+            try:
+                self.searcher = Searcher(max(1, int(value)), self.searcher.bitbase)
+            except ValueError:
+                self.send(f"info string invalid hash size {value}")
+        elif name == "bookfile":
+            if self.book is not None:
+                self.book.close()
+                self.book = None
+            if value and value != "<empty>":
+                try:
+                    self.book = PolyglotBook(value)
+                except OSError as error:
+                    self.send(f"info string can't open book: {error}")
+        elif name == "bitbasefile":
+            self.stop_search()
+            try:
+                self.searcher.bitbase = Bitbase(value) if value and value != "<empty>" else None
+            except (OSError, ValueError) as error:
+                self.send(f"info string can't open bitbase: {error}")
+
+    """
+    position [startpos | fen <fen>] [moves <move> ...]
+    """
+    def set_position(self, args):
+        moves_index = args.index("moves") if "moves" in args else len(args)
+        if args and args[0] == "fen":
+            fen = " ".join(args[1:moves_index])
+        else:
+            fen = START_FEN
+        try:
+            game_state = GameState.from_fen(fen)
+        except ValueError as error:
+            self.send(f"info string invalid fen: {error}")
+            return
+
+        for notation in args[moves_index + 1:]:
+            move = find_move(game_state, notation)
+            if move is None:
+                self.send(f"info string illegal move {notation}")
+                break
+            game_state.make_move(move)
+        self.game_state = game_state
+
+    """
+    go [wtime <ms>] [btime <ms>] [winc <ms>] [binc <ms>] [movestogo <n>] [movetime <ms>] [depth <n>]
+    [nodes <n>] [infinite] [ponder]
+    """
+    def go(self, args):
+        limits = {}
+        infinite = "infinite" in args
+        ponder = "ponder" in args
+        for name, value in zip(args, args[1:]):
+            if name in ("wtime", "btime", "winc", "binc", "movestogo", "movetime", "depth", "nodes"):
+                try:
+                    limits[name] = int(value)
+                except ValueError:
+                    pass
+
+        if self.book is not None and not infinite and not ponder:
+            move = self.book.choose_move(self.game_state)
+            if move is not None:
+                self.send(f"bestmove {move.get_chess_notation()}")
+                return
+
+        time_limit = self.time_for_move(limits)
+        if infinite:
+            time_limit = None
+        self.pondering = ponder
+        if ponder:
+            # Ponder without a limit, ponderhit starts the clock with the time the move would have had
+            self.ponder_time_limit = time_limit
+            time_limit = None
+        self.search_done.clear()
+        if not infinite and not ponder:
+            self.search_done.set()
+
+        max_depth = limits.get("depth", MAX_PLY - 1)
+        game_state = self.game_state
+        self.search_thread = threading.Thread(target=self.run_search, name="uci-search", daemon=True,
+                                              args=(game_state, max_depth, time_limit, limits.get("nodes")))
+        self.search_thread.start()
+
+    """
+    Seconds to spend on this move from the go limits, None to search until the depth or node limit
+    """
+    def time_for_move(self, limits):
+        if "movetime" in limits:
+            return max(limits["movetime"] / 1000 - MOVE_OVERHEAD, 0.001)
+        remaining = limits.get("wtime" if self.game_state.white_to_move else "btime")
+        if remaining is None:
+            return None
+        increment = limits.get("winc" if self.game_state.white_to_move else "binc", 0) / 1000
+        remaining /= 1000
+        budget = remaining / limits.get("movestogo", DEFAULT_MOVES_TO_GO) + increment * 0.8
+        return max(min(budget, remaining - MOVE_OVERHEAD), 0.001)
+
+    def run_search(self, game_state, max_depth, time_limit, node_limit):
+        result = self.searcher.search(game_state, max_depth, time_limit, node_limit, self.send_info)
+        if self.searcher.stopped:
+            self.send_info(result)  # Completed depths were reported already, this is the interrupted one
+        # In infinite and ponder mode the best move may only be sent after stop or ponderhit
+        self.search_done.wait()
+        if result.best_move is None:
+            self.send("bestmove 0000")
+        elif len(result.pv) > 1:
+            self.send(f"bestmove {result.best_move.get_chess_notation()} ponder {result.pv[1].get_chess_notation()}")
+        else:
+            self.send(f"bestmove {result.best_move.get_chess_notation()}")
+
+    def send_info(self, result):
+        mate_in = result.mate_in
+        score = f"mate {mate_in}" if mate_in is not None else f"cp {result.score}"
+        pv = " ".join(move.get_chess_notation() for move in result.pv)
+        self.send(f"info depth {result.depth} score {score} nodes {result.nodes} nps {result.nps} "
+                  f"time {int(result.elapsed * 1000)} hashfull {self.searcher.transposition_table.hashfull()} pv {pv}")
+
+    """
+    Stop the running search and wait for its bestmove to be sent
+    """
+    def stop_search(self):
+        if self.search_thread is None:
+            return
+        self.pondering = False
+        self.search_done.set()
+        while self.search_thread.is_alive():
+            # Repeated because a search thread that has only just started resets the stop flag
+            self.searcher.stop()
+            self.search_thread.join(0.01)
+        self.search_thread = None
+
+    """
+    The opponent played the ponder move, the ponder search carries on as a normal timed search
+    """
+    def ponder_hit(self):
+        if self.search_thread is None or not self.pondering:
+            return
+        self.pondering = False
+        if self.ponder_time_limit is not None:
+            self.searcher.deadline = time.perf_counter() + self.ponder_time_limit
+        self.search_done.set()
+
+
+'''
+The valid move in the position written in UCI long algebraic notation like e2e4, or None
+'''
+def find_move(game_state, notation):
+    for move in game_state.get_valid_moves():
+        if move.get_chess_notation() == notation[:4]:
+            return move
+    return None
+
+
+def main(input_stream=sys.stdin, output=sys.stdout):
+    engine = UciEngine(output)
+    for line in input_stream:
+        if not engine.handle(line):
+            break
+    else:
+        engine.stop_search()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Zobrist hashing and a fixed-size transposition table.
+A position's key is the XOR of one random 64-bit number per (piece, square) plus one for black to move, so
+make_move and undo_move can keep it up to date with a few XORs. Castling and en-passant keys are reserved for when
+the engine supports those moves.
+"""
+
+import random
+from array import array
+
+# Every piece in a fixed order, shared by the modules that index tables or encode boards by piece
+PIECES = ("wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK")
+
+_random = random.Random(0x6D6F6E676F)  # Fixed seed so keys are the same in every process and run
+PIECE_KEYS = {piece: [_random.getrandbits(64) for _ in range(64)] for piece in PIECES}
+SIDE_KEY = _random.getrandbits(64)  # XORed in when black is to move
+CASTLING_KEYS = [_random.getrandbits(64) for _ in range(16)]  # Indexed by a 4 bit castling rights mask
+EN_PASSANT_KEYS = [_random.getrandbits(64) for _ in range(8)]  # Indexed by the en-passant file
+
+# Bound types stored in the transposition table
+EXACT, LOWER, UPPER = 1, 2, 3
+
+
+'''
+Compute the key of a board from scratch, make_move and undo_move keep it up to date incrementally after that
+'''
+def compute_key(board, white_to_move):
+    key = 0
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece != "--":
+                key ^= PIECE_KEYS[piece][row * 8 + col]
+    if not white_to_move:
+        key ^= SIDE_KEY
+    return key
+
+
+class TranspositionTable:
+    # Every bucket holds two entries: slot 0 keeps the deepest search seen, slot 1 is always replaced.
+    # Entries are packed into two preallocated unsigned 64-bit arrays, the full key and a data word of
+    # score (32 bits) | best move (16 bits) | depth (8 bits) | bound (2 bits)
+    SCORE_OFFSET = 1 << 31
+
+    def __init__(self, size_mb=16):
+        entries = max(2, size_mb * 1024 * 1024 // 16)  # 16 bytes per entry
+        buckets = 1 << (entries // 2).bit_length() - 1  # Round down to a power of two for masking
+        self.mask = buckets - 1
+        self.keys = array("Q", bytes(16 * buckets))
+        self.data = array("Q", bytes(16 * buckets))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def clear(self):
+        self.keys = array("Q", bytes(8 * len(self.keys)))
+        self.data = array("Q", bytes(8 * len(self.data)))
+
+    """
+    Returns (depth, score, bound, move) stored for the key, or None if the position is not in the table
+    """
+    def probe(self, key):
+        index = (key & self.mask) << 1
+        for slot in (index, index + 1):
+            if self.keys[slot] == key:
+                data = self.data[slot]
+                if data:
+                    return ((data >> 2) & 0xFF, (data >> 26) - self.SCORE_OFFSET, data & 0x3,
+                            (data >> 10) & 0xFFFF)
+        return None
+
+    """
+    Store a search result, move is a 16-bit encoded move (0 when there is none)
+    """
+    def store(self, key, depth, score, bound, move=0):
+        index = (key & self.mask) << 1
+        data = ((score + self.SCORE_OFFSET) << 26) | (move << 10) | (min(depth, 255) << 2) | bound
+        # Depth-preferred slot: replace when it is the same position, empty or from a shallower search
+        if self.keys[index] == key or not self.data[index] or (self.data[index] >> 2) & 0xFF <= depth:
+            self.keys[index] = key
+            self.data[index] = data
+        else:
+            self.keys[index + 1] = key
+            self.data[index + 1] = data
+
+    """
+    Permille of entries in use, sampled from the first thousand like UCI's hashfull
+    """
+    def hashfull(self):
+        sample = min(1000, len(self.data))
+        used = sum(1 for i in range(sample) if self.data[i])
+        return used * 1000 // sample